@@ -1,7 +1,7 @@
 from typing import List, Dict
-import pandas as pd
 from dataclasses import dataclass
 import numpy as np
+from utils.telemetry import traced
 
 @dataclass
 class ProductScoreWeights:
@@ -10,6 +10,42 @@ class ProductScoreWeights:
     sentiment: float = 0.25
     popularity: float = 0.2
 
+SCORE_COLUMNS = ('price', 'features', 'sentiment', 'popularity')
+
+def weight_vector(weights: ProductScoreWeights) -> np.ndarray:
+    return np.array([getattr(weights, column) for column in SCORE_COLUMNS])
+
+class ScoredResultSet:
+    """Normalized feature matrix for one result set.
+
+    Built once per search; re-ranking under new weights is a single
+    matrix-vector product, with no price parsing or renormalization.
+    """
+
+    def __init__(self, products: List[Dict], normalized: Dict[str, np.ndarray]):
+        self.products = products
+        self.matrix = np.column_stack([normalized[column] for column in SCORE_COLUMNS])
+
+    def scores(self, weights: ProductScoreWeights) -> np.ndarray:
+        return np.round(self.matrix @ weight_vector(weights), 2)
+
+    @traced("rerank", items=len)
+    def rank(self, weights: ProductScoreWeights, top_n: int = None) -> List[Dict]:
+        """Products ordered by score under the given weights"""
+        scores = self.scores(weights)
+        ranked = []
+        for i in ComparativeAnalysisAgent.top_indices(scores, top_n):
+            row = self.matrix[i]
+            ranked.append({
+                **self.products[i],
+                'score': round(float(scores[i]), 2),
+                'normalized_price': round(float(row[0]), 2),
+                'normalized_features': round(float(row[1]), 2),
+                'normalized_sentiment': round(float(row[2]), 2),
+                'normalized_popularity': round(float(row[3]), 2)
+            })
+        return ranked
+
 class ComparativeAnalysisAgent:
     def __init__(self, weights: ProductScoreWeights = None):
         self.weights = weights or ProductScoreWeights()
@@ -28,46 +64,114 @@ class ComparativeAnalysisAgent:
             
         return [(val - min_val) / range_val for val in values]
 
-    def calculate_product_scores(self, products: List[Dict]) -> List[Dict]:
-        """Calculate composite scores for each product"""
+    @staticmethod
+    def parse_price(price) -> float:
+        """Turn a price such as '$1,299.99' or 99 into a float"""
+        if isinstance(price, str):
+            return float(price.replace('$', '').replace(',', ''))
+        return float(price)
+
+    @staticmethod
+    def _review_metric(product: Dict, key: str) -> float:
+        """Read a review metric from either a summary dict or a full analyze_reviews report"""
+        review_summary = product.get('review_summary') or {}
+        if key in review_summary:
+            return review_summary[key]
+        return review_summary.get('summary', {}).get(key, 0)
+
+    def build_columns(self, products: List[Dict]) -> Dict[str, np.ndarray]:
+        """Pull the scoring inputs out of product dicts into NumPy columns"""
+        return {
+            'price': np.fromiter((self.parse_price(p.get('price', 0)) for p in products),
+                                 dtype=np.float64, count=len(products)),
+            'features': np.fromiter((len(p.get('key_features', [])) for p in products),
+                                    dtype=np.float64, count=len(products)),
+            'sentiment': np.fromiter((self._review_metric(p, 'average_polarity') for p in products),
+                                     dtype=np.float64, count=len(products)),
+            'popularity': np.fromiter((self._review_metric(p, 'total_reviews') for p in products),
+                                      dtype=np.float64, count=len(products))
+        }
+
+    @staticmethod
+    def normalize_array(values: np.ndarray) -> np.ndarray:
+        """Vectorized normalize_scores"""
+        if values.size == 0:
+            return values.astype(np.float64)
+        min_val = values.min()
+        range_val = values.max() - min_val
+        if range_val == 0:
+            return np.full(values.shape, 0.5)
+        return (values - min_val) / range_val
+
+    def normalize_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Normalize every scoring column to 0-1 in one pass"""
+        return {
+            'price': self.normalize_array(-columns['price']),  # Lower price is better
+            'features': self.normalize_array(columns['features']),
+            'sentiment': self.normalize_array(columns['sentiment']),
+            'popularity': self.normalize_array(columns['popularity'])
+        }
+
+    def weighted_scores(self, normalized: Dict[str, np.ndarray]) -> np.ndarray:
+        """Weighted sum of the normalized columns"""
+        return (
+            self.weights.price * normalized['price'] +
+            self.weights.features * normalized['features'] +
+            self.weights.sentiment * normalized['sentiment'] +
+            self.weights.popularity * normalized['popularity']
+        )
+
+    @staticmethod
+    def top_indices(scores: np.ndarray, top_n: int = None) -> np.ndarray:
+        """Indices of the best scores, highest first and earliest first on ties.
+
+        Uses a partial selection so only the winners are sorted.
+        """
+        n = scores.size
+        if top_n is None or top_n >= n:
+            return np.argsort(-scores, kind='stable')
+        if top_n <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        threshold = np.partition(scores, n - top_n)[n - top_n]
+        above = np.flatnonzero(scores > threshold)
+        at_threshold = np.flatnonzero(scores == threshold)[:top_n - above.size]
+        candidates = np.concatenate([above, at_threshold])
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    def score_catalog(self, price: np.ndarray, features: np.ndarray, sentiment: np.ndarray,
+                      popularity: np.ndarray = None, top_n: int = 10):
+        """Score a columnar catalog and return (indices, scores) of the top N"""
+        columns = {
+            'price': np.asarray(price, dtype=np.float64),
+            'features': np.asarray(features, dtype=np.float64),
+            'sentiment': np.asarray(sentiment, dtype=np.float64)
+        }
+        columns['popularity'] = (np.zeros_like(columns['price']) if popularity is None
+                                 else np.asarray(popularity, dtype=np.float64))
+        scores = np.round(self.weighted_scores(self.normalize_columns(columns)), 2)
+        top = self.top_indices(scores, top_n)
+        return top, scores[top]
+
+    @traced("normalize", items=lambda result_set: len(result_set.products))
+    def prepare(self, products: List[Dict]) -> ScoredResultSet:
+        """Normalize a result set for ranking; callers keep the result to re-rank it under new weights"""
+        return ScoredResultSet(products, self.normalize_columns(self.build_columns(products)))
+
+    def _rank(self, products: List[Dict], top_n: int = None) -> List[Dict]:
+        """Score products columnar and build dicts only for the ranked winners"""
         if not products:
             return []
-            
-        # Extract relevant data
-        prices = [float(p.get('price', 0).replace('$', '').replace(',', '')) 
-                 if isinstance(p.get('price'), str) 
-                 else float(p.get('price', 0)) 
-                 for p in products]
-        feature_counts = [len(p.get('key_features', [])) for p in products]
-        sentiment_scores = [p.get('review_summary', {}).get('average_polarity', 0) 
-                          for p in products]
-        
-        # Normalize scores
-        norm_prices = self.normalize_scores([-p for p in prices])  # Lower price is better
-        norm_features = self.normalize_scores(feature_counts)
-        norm_sentiment = self.normalize_scores(sentiment_scores)
-        
-        # Calculate weighted scores
-        scored_products = []
-        for i, product in enumerate(products):
-            score = (
-                self.weights.price * norm_prices[i] +
-                self.weights.features * norm_features[i] +
-                self.weights.sentiment * norm_sentiment[i]
-            )
-            
-            scored_products.append({
-                **product,
-                'score': round(score, 2),
-                'normalized_price': round(norm_prices[i], 2),
-                'normalized_features': round(norm_features[i], 2),
-                'normalized_sentiment': round(norm_sentiment[i], 2)
-            })
-            
-        return sorted(scored_products, key=lambda x: x['score'], reverse=True)
+        return self.prepare(products).rank(self.weights, top_n)
+
+    @traced("ranking", items=len)
+    def calculate_product_scores(self, products: List[Dict]) -> List[Dict]:
+        """Calculate composite scores for each product"""
+        return self._rank(products)
 
-    def create_comparison_table(self, products: List[Dict]) -> pd.DataFrame:
+    def create_comparison_table(self, products: List[Dict]) -> "pd.DataFrame":
         """Create a comparison table from scored products"""
+        import pandas as pd
         if not products:
             return pd.DataFrame()
             
@@ -87,8 +191,7 @@ class ComparativeAnalysisAgent:
 
     def get_top_products(self, products: List[Dict], top_n: int = 3) -> List[Dict]:
         """Get top N products based on scores"""
-        scored = self.calculate_product_scores(products)
-        return scored[:top_n]
+        return self._rank(products, top_n)
 
 if __name__ == "__main__":
     agent = ComparativeAnalysisAgent()
@@ -1,72 +1,71 @@
-from bs4 import BeautifulSoup
-import requests
-from typing import Dict, List
-import re
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-import string
+from typing import Dict, Iterable, List
+from utils.scraper import FetchedDocument, fetch_document
+from utils.http_client import HttpClient, get_http_client
+from utils.nlp_utils import KeywordExtractor, current_keyword_corpus
+from utils.scheduler import FetchScheduler
+from utils.spec_extraction import SPEC_FIELDS, SpecParser, extract_specs, feed_until_complete
+from utils.telemetry import traced, tracer
 
 class FeatureExtractionAgent:
-    def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
-        self.spec_patterns = {
-            'brand': r'(brand|manufacturer|made by|by)\s*[:]?\s*([^\n<]+)',
-            'model': r'(model|item)\s*(number|no)?\s*[:]?\s*([^\n<]+)',
-            'weight': r'(weight)\s*[:]?\s*([^\n<]+)',
-            'dimensions': r'(dimensions?|size)\s*[:]?\s*([^\n<]+)'
-        }
+    def __init__(self, client: HttpClient = None, scheduler: FetchScheduler = None):
+        self.client = client or get_http_client()
+        self.scheduler = scheduler
+        # Used outside a keyword_corpus block, e.g. by direct calls; capped at KEYWORD_MAX_DOCUMENTS
+        self.keywords = KeywordExtractor()
 
-    def extract_specifications(self, url: str) -> Dict:
-        """Extract product specifications from a product page"""
+    def extract_specifications(self, url: str, document: FetchedDocument = None,
+                               fields: Iterable[str] = SPEC_FIELDS) -> Dict:
+        """Extract product specifications from a product page.
+
+        Structured data (JSON-LD, microdata, meta tags, spec tables) is read
+        first; regexes over the visible text only fill fields it lacks.
+        Tokenizing the page costs more than the old whole-page regexes on
+        typical pages (about 1.5-2x, still well under a millisecond) and
+        less on multi-megabyte ones (about 2x faster); the spec_page_*
+        benchmark stages show both.
+        """
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find specification tables/sections
-            specs = {}
-            for name, pattern in self.spec_patterns.items():
-                matches = re.findall(pattern, response.text, re.IGNORECASE)
-                if matches:
-                    specs[name] = matches[0][-1].strip()
-            
-            return specs
+            document = document or fetch_document(url, self.client, scheduler=self.scheduler)
+            return extract_specs(document.text, fields)
             
         except Exception as e:
             print(f"Error extracting specifications: {e}")
             return {}
 
-    def analyze_description(self, text: str) -> List[str]:
-        """Analyze product description to extract key features"""
+    def analyze_description(self, text: str, top_k: int = 10) -> List[str]:
+        """Key terms of a product description, ranked by TF-IDF across the current run's descriptions"""
         try:
-            # Clean and tokenize text
-            text = text.lower()
-            tokens = word_tokenize(text)
-            tokens = [word for word in tokens if word not in self.stop_words]
-            tokens = [word for word in tokens if word not in string.punctuation]
-            
-            # Extract meaningful keywords (simplified)
-            keywords = []
-            for word in tokens:
-                if len(word) > 3 and word.isalpha():
-                    keywords.append(word)
-                    
-            return list(set(keywords))[:10]  # Return top 10 unique keywords
+            return (current_keyword_corpus() or self.keywords).extract(text, top_k)
             
         except Exception as e:
             print(f"Error analyzing description: {e}")
             return []
 
-    def get_product_features(self, url: str) -> Dict:
-        """Get all product features including specs and key description points"""
-        specs = self.extract_specifications(url)
-        
+    @traced("features", items=lambda features: len(features.get('specifications', {})))
+    def get_product_features(self, url: str, document: FetchedDocument = None) -> Dict:
+        """Get all product features including specs and key description points.
+
+        Fetched pages are parsed while they stream in, and the download stops
+        once the meta description and every spec field have been seen.
+        """
+        parser = SpecParser(SPEC_FIELDS, want_description=True)
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            description = soup.find('meta', attrs={'name': 'description'})
-            description = description['content'] if description else ""
+            if document is None:
+                fetch_document(url, self.client, parser=parser, scheduler=self.scheduler)
+            else:
+                with tracer.span("specs"):
+                    feed_until_complete(parser, document.text)
+        except Exception as e:
+            print(f"Error fetching product page: {e}")
+            return {}
             
-            key_features = self.analyze_description(description)
+        specs = parser.specs()
+        
+        try:
+            with tracer.span("description"):
+                description = parser.description or ""
+                
+                key_features = self.analyze_description(description)
             
             return {
                 'specifications': specs,
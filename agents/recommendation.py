@@ -1,6 +1,7 @@
 from typing import List, Dict
 from dataclasses import dataclass
 import textwrap
+from utils.telemetry import traced
 
 @dataclass
 class RecommendationConfig:
@@ -12,6 +13,7 @@ class RecommendationAgent:
     def __init__(self, config: RecommendationConfig = None):
         self.config = config or RecommendationConfig()
 
+    @traced("recommendation")
     def generate_recommendation(self, top_products: List[Dict]) -> Dict:
         """Generate recommendation report for top products"""
         if not top_products:
@@ -1,75 +1,216 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 import re
-from textblob import TextBlob
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import nltk
-nltk.download('vader_lexicon', quiet=True)
+import threading
+from importlib.metadata import version
+import config
+from utils.resources import ensure_nltk_resources
+from utils.sentiment_cache import SentimentMemo, get_sentiment_memo, memo_key
+from utils.streaming import HeavyHitters, RunningStats
+from utils.telemetry import annotate, traced
+
+SCORERS = ('vader', 'textblob')
+
+# Bump when cleaning or scoring changes so memoized scores are not reused
+SCORER_VERSION = f"2|nltk-{version('nltk')}|textblob-{version('textblob')}"
+
+CLEAN_PATTERNS = [
+    r'<[^>]+>',  # HTML tags
+    r'http\S+',  # URLs
+    r'\@\w+',    # Mentions
+    r'\#\w+',    # Hashtags
+    r'\d+',      # Numbers
+]
+
+# Applied one after another, as a removal can join text into a new match (e.g. "a@<b>c" -> "a@c" -> "a")
+CLEAN_RES = [re.compile(pattern) for pattern in CLEAN_PATTERNS]
+
+# nltk and textblob take over a second to import, so they are loaded on first use
+_TextBlob = None
+
+def load_vader():
+    """Build a VADER analyzer, checking the lexicon is installed first"""
+    ensure_nltk_resources(['vader_lexicon'])
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+def _textblob(text: str):
+    global _TextBlob
+    if _TextBlob is None:
+        from textblob import TextBlob
+        _TextBlob = TextBlob
+    return _TextBlob(text)
+
+def score_text(cleaned_text: str, sid, scorers: Iterable[str] = SCORERS) -> Dict:
+    """Score already-cleaned text with the selected scorers"""
+    result = {}
+
+    if 'vader' in scorers:
+        vader_scores = sid.polarity_scores(cleaned_text)
+        result['vader'] = {
+            'compound': vader_scores['compound'],
+            'positive': vader_scores['pos'],
+            'negative': vader_scores['neg'],
+            'neutral': vader_scores['neu']
+        }
+
+    if 'textblob' in scorers:
+        blob_sentiment = _textblob(cleaned_text).sentiment
+        result['textblob'] = {
+            'polarity': blob_sentiment.polarity,
+            'subjectivity': blob_sentiment.subjectivity
+        }
+
+    result['text'] = cleaned_text
+    return result
+
+# Each pool worker loads the VADER lexicon once and reuses it for every chunk
+_worker_sid = None
+
+def _init_worker():
+    global _worker_sid
+    _worker_sid = load_vader()
+
+def _score_chunk(texts: List[str], scorers: Iterable[str]) -> List[Dict]:
+    return [score_text(text, _worker_sid, scorers) for text in texts]
 
 class ReviewAnalysisAgent:
-    def __init__(self):
-        self.sid = SentimentIntensityAnalyzer()
-        self.clean_patterns = [
-            r'<[^>]+>',  # HTML tags
-            r'http\S+',  # URLs
-            r'\@\w+',    # Mentions
-            r'\#\w+',    # Hashtags
-            r'\d+',      # Numbers
-        ]
+    def __init__(self, workers: int = None, memo: SentimentMemo = None):
+        self._sid = None
+        self.clean_patterns = CLEAN_PATTERNS
+        self.workers = workers or config.SENTIMENT_WORKERS
+        self.memo = memo or get_sentiment_memo()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def sid(self):
+        """VADER analyzer, loaded when the first review is scored"""
+        if self._sid is None:
+            self._sid = load_vader()
+        return self._sid
 
     def clean_review_text(self, text: str) -> str:
         """Clean review text by removing unwanted patterns"""
-        for pattern in self.clean_patterns:
-            text = re.sub(pattern, '', text)
+        for pattern in CLEAN_RES:
+            text = pattern.sub('', text)
         return text.strip()
 
-    def analyze_sentiment(self, text: str) -> Dict:
+    def analyze_sentiment(self, text: str, scorers: Iterable[str] = SCORERS) -> Dict:
         """Analyze sentiment of a single review"""
-        cleaned_text = self.clean_review_text(text)
-        
-        # Using VADER
-        vader_scores = self.sid.polarity_scores(cleaned_text)
-        
-        # Using TextBlob
-        blob = TextBlob(cleaned_text)
-        blob_sentiment = blob.sentiment
-        
-        return {
-            'vader': {
-                'compound': vader_scores['compound'],
-                'positive': vader_scores['pos'],
-                'negative': vader_scores['neg'],
-                'neutral': vader_scores['neu']
-            },
-            'textblob': {
-                'polarity': blob_sentiment.polarity,
-                'subjectivity': blob_sentiment.subjectivity
-            },
-            'text': cleaned_text
+        return self.score_batch([text], scorers)[0]
+
+    def _memo_key(self, cleaned_text: str, scorers: Iterable[str]) -> str:
+        return memo_key(cleaned_text, f"{SCORER_VERSION}|{','.join(sorted(scorers))}")
+
+    def score_batch(self, reviews: List[str], scorers: Iterable[str] = SCORERS) -> List[Dict]:
+        """Clean and score a batch, scoring each distinct text at most once"""
+        return self._score_batch(reviews, scorers)[0]
+
+    def _score_batch(self, reviews: List[str], scorers: Iterable[str]) -> Tuple[List[Dict], Dict]:
+        """score_batch's results with the batch's dedupe and cache stats.
+
+        The stats are returned rather than kept on the agent, which is shared
+        by pipeline threads and sessions.
+        """
+        scorers = tuple(scorers)
+        if not scorers or not set(scorers) <= set(SCORERS):
+            raise ValueError(f"scorers must be a non-empty selection of {SCORERS}, got {scorers!r}")
+        cleaned = [self.clean_review_text(review) for review in reviews]
+
+        # Collapse duplicates, then serve whatever the memo already knows
+        unique = list(dict.fromkeys(cleaned))
+        keys = {text: self._memo_key(text, scorers) for text in unique}
+        known = self.memo.get_many(keys.values()) if self.memo else {}
+        pending = [text for text in unique if keys[text] not in known]
+
+        fresh = {}
+        for text, result in zip(pending, self._score_cleaned(pending, scorers)):
+            del result['text']
+            fresh[keys[text]] = result
+        if self.memo:
+            self.memo.put_many(fresh)
+        known.update(fresh)
+
+        stats = {
+            'reviews': len(cleaned),
+            'unique_reviews': len(unique),
+            'dedupe_ratio': 1 - len(unique) / len(cleaned) if cleaned else 0.0,
+            'cache_hits': len(unique) - len(pending),
+            'cache_hit_rate': (len(unique) - len(pending)) / len(unique) if unique else 0.0
         }
+        return [{**known[keys[text]], 'text': text} for text in cleaned], stats
+
+    def _score_cleaned(self, cleaned: List[str], scorers: tuple) -> List[Dict]:
+        """Score cleaned texts, spreading large batches across worker processes"""
+        if self.workers <= 1 or len(cleaned) < config.SENTIMENT_PARALLEL_MIN_REVIEWS:
+            return [score_text(text, self.sid, scorers) for text in cleaned]
+
+        # Enough chunks to keep every worker busy, but no smaller than the configured size
+        chunk_size = max(config.SENTIMENT_CHUNK_SIZE, -(-len(cleaned) // (self.workers * 4)))
+        chunks = [cleaned[i:i + chunk_size] for i in range(0, len(cleaned), chunk_size)]
+        results = []
+        for chunk_results in self._get_pool().map(_score_chunk, chunks, repeat(scorers)):
+            results.extend(chunk_results)
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Worker processes are started on first use and kept for later batches"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
 
-    def analyze_reviews(self, reviews: List[str]) -> Dict:
+    def close(self):
+        """Shut down the worker processes"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        self._pool_lock = threading.Lock()
+
+    @traced("reviews", items=lambda report: report.get('summary', {}).get('total_reviews', 0))
+    def analyze_reviews(self, reviews: List[str], scorers: Iterable[str] = SCORERS) -> Dict:
         """Analyze a batch of reviews and return aggregated sentiment"""
         if not reviews:
             return {}
-            
-        results = []
+
+        results, stats = self._score_batch(reviews, scorers)
+        report = self.summarize(results)
+        report['stats'] = stats
+        annotate(cache_hits=report['stats']['cache_hits'])
+        return report
+
+    def summarize(self, results: List[Dict]) -> Dict:
+        """Aggregate per-review scores into the report returned by analyze_reviews.
+
+        Reviews are classified on the VADER compound score and averaged on
+        TextBlob polarity; when only one scorer ran, its score stands in for both.
+        """
         positive_count = 0
         negative_count = 0
         neutral_count = 0
-        
-        for review in reviews:
-            analysis = self.analyze_sentiment(review)
-            results.append(analysis)
-            
+
+        for analysis in results:
             # Classify based on VADER compound score
-            if analysis['vader']['compound'] >= 0.05:
+            score = self._classification_score(analysis)
+            if score >= 0.05:
                 positive_count += 1
-            elif analysis['vader']['compound'] <= -0.05:
+            elif score <= -0.05:
                 negative_count += 1
             else:
                 neutral_count += 1
-                
-        total = len(reviews)
+
+        total = len(results)
+        if results and 'textblob' in results[0]:
+            average_polarity = sum(r['textblob']['polarity'] for r in results) / total
+            average_subjectivity = sum(r['textblob']['subjectivity'] for r in results) / total
+        else:
+            average_polarity = sum(r['vader']['compound'] for r in results) / total
+            average_subjectivity = 0.0
+
         return {
             'reviews': results,
             'summary': {
@@ -77,25 +218,108 @@ class ReviewAnalysisAgent:
                 'positive_percent': (positive_count / total) * 100,
                 'negative_percent': (negative_count / total) * 100,
                 'neutral_percent': (neutral_count / total) * 100,
-                'average_polarity': sum(r['textblob']['polarity'] for r in results) / total,
-                'average_subjectivity': sum(r['textblob']['subjectivity'] for r in results) / total
+                'average_polarity': average_polarity,
+                'average_subjectivity': average_subjectivity
             },
             'common_themes': self.extract_common_themes([r['text'] for r in results])
         }
 
+    @staticmethod
+    def _classification_score(analysis: Dict) -> float:
+        return analysis['vader']['compound'] if 'vader' in analysis else analysis['textblob']['polarity']
+
+    @staticmethod
+    def _theme_tokens(review: str) -> List[str]:
+        tokens = review.lower().split()
+        return [word for word in tokens if len(word) > 3 and word.isalpha()]
+
     def extract_common_themes(self, reviews: List[str]) -> List[str]:
         """Extract common themes from reviews using simple frequency analysis"""
-        from collections import Counter
         words = []
-        
+
         for review in reviews:
-            tokens = review.lower().split()
-            tokens = [word for word in tokens if len(word) > 3 and word.isalpha()]
-            words.extend(tokens)
-            
+            words.extend(self._theme_tokens(review))
+
         word_counts = Counter(words)
         return [word for word, count in word_counts.most_common(5)]
 
+    def analyze_reviews_stream(self, reviews: Iterable[str], scorers: Iterable[str] = SCORERS,
+                               include_details: bool = False, chunk_size: int = None) -> Dict:
+        """Analyze reviews from any iterator in constant memory.
+
+        Reviews are scored a chunk at a time and folded into running
+        aggregates; themes come from a bounded heavy-hitters sketch. The
+        per-review results are only kept when include_details is set.
+        """
+        scorers = tuple(scorers)
+        chunk_size = chunk_size or config.SENTIMENT_CHUNK_SIZE
+        reviews = iter(reviews)
+
+        counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+        polarity = RunningStats()
+        subjectivity = RunningStats()
+        themes = HeavyHitters(config.THEME_SKETCH_SIZE)
+        details = []
+        unique_reviews = 0
+        cache_hits = 0
+
+        while True:
+            chunk = list(islice(reviews, chunk_size))
+            if not chunk:
+                break
+            results, stats = self._score_batch(chunk, scorers)
+            unique_reviews += stats['unique_reviews']
+            cache_hits += stats['cache_hits']
+
+            chunk_words = Counter()
+            for analysis in results:
+                score = self._classification_score(analysis)
+                if score >= 0.05:
+                    counts['positive'] += 1
+                elif score <= -0.05:
+                    counts['negative'] += 1
+                else:
+                    counts['neutral'] += 1
+
+                if 'textblob' in analysis:
+                    polarity.add(analysis['textblob']['polarity'])
+                    subjectivity.add(analysis['textblob']['subjectivity'])
+                else:
+                    polarity.add(analysis['vader']['compound'])
+                chunk_words.update(self._theme_tokens(analysis['text']))
+            themes.update(chunk_words)
+
+            if include_details:
+                details.extend(results)
+
+        total = sum(counts.values())
+        if not total:
+            return {}
+
+        report = {
+            'summary': {
+                'total_reviews': total,
+                'positive_percent': (counts['positive'] / total) * 100,
+                'negative_percent': (counts['negative'] / total) * 100,
+                'neutral_percent': (counts['neutral'] / total) * 100,
+                'average_polarity': polarity.mean,
+                'average_subjectivity': subjectivity.mean,
+                'polarity_variance': polarity.variance,
+                'subjectivity_variance': subjectivity.variance
+            },
+            'common_themes': [word for word, count in themes.top(5)],
+            'stats': {
+                'reviews': total,
+                'unique_reviews': unique_reviews,
+                'dedupe_ratio': 1 - unique_reviews / total,
+                'cache_hits': cache_hits,
+                'cache_hit_rate': cache_hits / unique_reviews if unique_reviews else 0.0
+            }
+        }
+        if include_details:
+            report['reviews'] = details
+        return report
+
 if __name__ == "__main__":
     agent = ReviewAnalysisAgent()
     test_reviews = [
@@ -1,55 +1,35 @@
 import requests
-from bs4 import BeautifulSoup
 from typing import List, Dict
 import json
 import os
+from utils.scraper import FetchedDocument, fetch_document
+from utils.http_client import HttpClient, get_http_client
+from utils.scheduler import FetchScheduler
+from utils.search_cache import SearchResultCache, get_search_cache
+from utils.telemetry import traced
+import config
 
 class WebSearchAgent:
-    def __init__(self, api_key: str = None, search_engine_id: str = None):
+    def __init__(self, api_key: str = None, search_engine_id: str = None, client: HttpClient = None,
+                 cache: SearchResultCache = None, base_url: str = None, scheduler: FetchScheduler = None):
         """Initialize with either direct credentials or read from environment variables"""
+        self.client = client or get_http_client()
+        self.cache = cache or get_search_cache()
         self.api_key = api_key or os.getenv("GOOGLE_API")
         self.search_engine_id = search_engine_id or os.getenv("SEARCH_ENGINE_ID")
-        self.base_url = "https://www.googleapis.com/customsearch/v1"
+        self.base_url = base_url or config.SEARCH_API_URL
+        self.scheduler = scheduler
         
         if not self.api_key or not self.search_engine_id:
             raise ValueError("Missing required API credentials. Please provide both API key and Search Engine ID")
         
+    @traced("search", items=len)
     def search_products(self, query: str, num_results: int = 5) -> List[Dict]:
         """Search for products using Google Custom Search API"""
-            
-        params = {
-            'q': query,
-            'key': self.api_key,
-            'cx': self.search_engine_id,
-            'num': num_results
-        }
-        
         try:
-            response = requests.get(self.base_url, params=params)
-            
-            # Check for API-specific errors
-            if response.status_code == 403:
-                error_data = response.json()
-                print(f"API Error: {error_data.get('error', {}).get('message', 'Forbidden')}")
-                print("Possible causes:")
-                print("- Invalid API key or Search Engine ID")
-                print("- API not enabled in Google Cloud Console")
-                print("- Exceeded daily quota")
-                return []
-                
-            response.raise_for_status()
-            results = response.json().get('items', [])
-            
-            # Filter and format results
-            product_links = []
-            for item in results:
-                if 'link' in item:
-                    product_links.append({
-                        'title': item.get('title'),
-                        'link': item.get('link'),
-                        'snippet': item.get('snippet')
-                    })
-            return product_links
+            if self.cache is None:
+                return self._query_api(query, num_results)
+            return self.cache.get_or_fetch(query, num_results, lambda: self._query_api(query, num_results))
             
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {str(e)}")
@@ -61,11 +41,45 @@ class WebSearchAgent:
             print(f"Unexpected error: {str(e)}")
             return []
 
-    def extract_product_details(self, url: str) -> Dict:
+    def _query_api(self, query: str, num_results: int) -> List[Dict]:
+        """Call the Custom Search endpoint; raises on failure so errors are never cached"""
+        params = {
+            'q': query,
+            'key': self.api_key,
+            'cx': self.search_engine_id,
+            'num': num_results
+        }
+        
+        response = self.client.get(self.base_url, params=params)
+        
+        # Check for API-specific errors
+        if response.status_code == 403:
+            error_data = response.json()
+            print(f"API Error: {error_data.get('error', {}).get('message', 'Forbidden')}")
+            print("Possible causes:")
+            print("- Invalid API key or Search Engine ID")
+            print("- API not enabled in Google Cloud Console")
+            print("- Exceeded daily quota")
+            
+        response.raise_for_status()
+        results = response.json().get('items', [])
+        
+        # Filter and format results
+        product_links = []
+        for item in results:
+            if 'link' in item:
+                product_links.append({
+                    'title': item.get('title'),
+                    'link': item.get('link'),
+                    'snippet': item.get('snippet')
+                })
+        return product_links
+
+    def extract_product_details(self, url: str, document: FetchedDocument = None) -> Dict:
         """Extract basic product details from a product page"""
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            document = document or fetch_document(url, self.client, scheduler=self.scheduler)
+            soup = document.soup
             
             # Basic extraction - to be customized per site
             title = soup.find('h1').text if soup.find('h1') else ""
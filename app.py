@@ -1,67 +1,104 @@
+import time
 import streamlit as st
 from typing import Dict, List
-import json
-import pandas as pd
-import plotly.express as px
 from pathlib import Path
-
-# Import agents
-from agents.web_search import WebSearchAgent
-from agents.feature_extraction import FeatureExtractionAgent
-from agents.review_analysis import ReviewAnalysisAgent
-from agents.comparative_analysis import ComparativeAnalysisAgent
+from utils.deadline import deadline_scope
+from utils.startup import startup_report
+from utils.telemetry import serve_metrics, tracer
+import config
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
-from agents.recommendation import RecommendationAgent
+# Agents are created on first use and kept for the life of the process,
+# shared by every session and rerun. Heavy libraries (nltk, textblob,
+# pandas, plotly, bs4) are imported only by the stage that needs them.
+
+@st.cache_resource
+def get_search_agent():
+    with startup_report.stage("search_agent"):
+        from agents.web_search import WebSearchAgent
+        return WebSearchAgent()  # Will now properly get credentials from .env
+
+@st.cache_resource
+def get_analysis_agent():
+    with startup_report.stage("analysis_agent"):
+        from agents.comparative_analysis import ComparativeAnalysisAgent
+        return ComparativeAnalysisAgent()
+
+@st.cache_resource
+def get_recommendation_agent():
+    with startup_report.stage("recommendation_agent"):
+        from agents.recommendation import RecommendationAgent
+        return RecommendationAgent()
+
+@st.cache_resource
+def get_research_pipeline():
+    with startup_report.stage("research_pipeline"):
+        from agents.feature_extraction import FeatureExtractionAgent
+        from utils.sentiment_service import review_agent
+        from pipeline import ResearchPipeline
+        return ResearchPipeline(FeatureExtractionAgent(), review_agent())
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve Prometheus metrics from a background thread when METRICS_PORT is set"""
+    if config.METRICS_PORT:
+        return serve_metrics(config.METRICS_PORT)
 
-# Initialize agents
-search_agent = WebSearchAgent()  # Will now properly get credentials from .env
-feature_agent = FeatureExtractionAgent()
-review_agent = ReviewAnalysisAgent()
-analysis_agent = ComparativeAnalysisAgent()
-recommendation_agent = RecommendationAgent()
+@st.cache_resource
+def start_prefetcher():
+    """Keep popular queries warm from a background thread when PREFETCH_ENABLED is set"""
+    if config.PREFETCH_ENABLED:
+        from utils.prefetch import Prefetcher
+        return Prefetcher(get_research_store()).start()
 
-# Data storage paths
-DATA_DIR = Path("data")
+# Legacy JSON files, imported into the research store on first run
+DATA_DIR = Path(config.DATA_DIR)
 PRODUCTS_FILE = DATA_DIR / "products.json"
 REVIEWS_FILE = DATA_DIR / "reviews.json"
 
-def ensure_data_dir():
-    """Ensure data directory exists"""
-    DATA_DIR.mkdir(exist_ok=True)
+@st.cache_resource
+def get_research_store():
+    with startup_report.stage("research_store"):
+        from utils.storage import ResearchStore
+        store = ResearchStore()
+        store.import_json(str(PRODUCTS_FILE), str(REVIEWS_FILE))
+        return store
 
-def load_data() -> Dict[str, List[Dict]]:
-    """Load existing data from files"""
-    ensure_data_dir()
-    
-    data = {"products": [], "reviews": []}
-    try:
-        if PRODUCTS_FILE.exists():
-            with open(PRODUCTS_FILE, "r") as f:
-                data["products"] = json.load(f)
-        if REVIEWS_FILE.exists():
-            with open(REVIEWS_FILE, "r") as f:
-                data["reviews"] = json.load(f)
-    except json.JSONDecodeError:
-        pass
-        
-    return data
+def load_data(query: str = None, page: int = 0):
+    """One page of stored products for a query (the latest one by default).
 
-def save_data(products: List[Dict], reviews: List[Dict]):
-    """Save data to files"""
-    ensure_data_dir()
-    
-    with open(PRODUCTS_FILE, "w") as f:
-        json.dump(products, f, indent=2)
-    with open(REVIEWS_FILE, "w") as f:
-        json.dump(reviews, f, indent=2)
+    Sessions viewing the same page of the same stored results get the same
+    frozen SharedResultSet instead of each loading its own copy.
+    """
+    from utils.records import SharedResultSet, result_sets
+    from utils.search_cache import normalize_query
+    research_store = get_research_store()
+    query = query or research_store.latest_query()
+    if not query:
+        return SharedResultSet(None, [], 0, page)
+    info = research_store.search_info(query)
+    key = (normalize_query(query), page, info['updated_at'] if info else None)
+    return result_sets.get(key, lambda: SharedResultSet(
+        query,
+        research_store.load_products(query, limit=config.PRODUCTS_PAGE_SIZE,
+                                     offset=page * config.PRODUCTS_PAGE_SIZE),
+        research_store.count_products(query),
+        page
+    ))
+
+def save_data(query: str, products: List[Dict]):
+    """Upsert this query's products, reviews and analyses into the store"""
+    get_research_store().upsert_products(query, products, replace=True)
 
 def display_product_details(product: Dict):
     """Display product details section"""
     with st.expander(f"📋 {product['title']} - Details"):
+        if product.get('status') == "timeout":
+            st.caption("⏱️ Incomplete: the time limit was reached before this product was fully researched")
         st.subheader("Specifications")
         if 'specifications' in product:
+            import pandas as pd
             specs = pd.DataFrame(
                 product['specifications'].items(),
                 columns=["Feature", "Value"]
@@ -72,6 +109,11 @@ def display_product_details(product: Dict):
         if 'key_features' in product:
             for feature in product['key_features']:
                 st.markdown(f"- {feature}")
+        
+        if len(product.get('sources', [])) > 1:
+            st.subheader("Listed At")
+            for source in product['sources']:
+                st.markdown(f"- {source}")
 
 def display_review_insights(review_summary: Dict):
     """Display review analysis section"""
@@ -97,6 +139,7 @@ def display_review_insights(review_summary: Dict):
         
         # Sentiment distribution chart
         if 'sentiment_distribution' in review_summary:
+            import plotly.express as px
             fig = px.pie(
                 names=["Positive", "Neutral", "Negative"],
                 values=[
@@ -108,6 +151,14 @@ def display_review_insights(review_summary: Dict):
             )
             st.plotly_chart(fig, use_container_width=True)
 
+        if 'stats' in review_summary:
+            stats = review_summary['stats']
+            st.caption(
+                f"{stats.get('unique_reviews', 0)} distinct of {stats.get('reviews', 0)} reviews "
+                f"(dedupe {stats.get('dedupe_ratio', 0):.0%}), "
+                f"sentiment cache hit rate {stats.get('cache_hit_rate', 0):.0%}"
+            )
+
 def display_comparison(products: List[Dict]):
     """Display product comparison section"""
     with st.expander("🔍 Product Comparison"):
@@ -115,7 +166,7 @@ def display_comparison(products: List[Dict]):
             st.info("Add more products to enable comparison")
             return
             
-        comparison_df = analysis_agent.create_comparison_table(products)
+        comparison_df = get_analysis_agent().create_comparison_table(products)
         st.dataframe(comparison_df)
 
 def display_recommendation(recommendation: Dict):
@@ -146,65 +197,301 @@ def display_recommendation(recommendation: Dict):
                 st.caption(alt["reason"])
                 st.info(f"Key strength: {alt['key_strength']}")
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_aspect_sentiment(scope: str, version: float) -> Dict:
+    """Aspect sentiment for one query (or all, for None), recomputed only when the store's version moves"""
+    return get_research_store().aspect_sentiment(query=scope)
+
+def display_review_explorer(query: str):
+    """Query the review index: which products' reviews mention a term, and aspect sentiment"""
+    with st.expander("🔎 Review Explorer"):
+        research_store = get_research_store()
+        col1, col2, col3 = st.columns([3, 1, 1])
+        text = col1.text_input("Reviews mentioning", placeholder="battery")
+        sentiment = col2.selectbox("Sentiment", ["any", "negative", "neutral", "positive"])
+        scope = None if col3.checkbox("All searches") else query
+        
+        start = time.perf_counter()
+        matches = research_store.search_reviews(text, None if sentiment == "any" else sentiment, scope) if text else []
+        aspects = get_aspect_sentiment(scope, research_store.version())
+        elapsed = time.perf_counter() - start
+        
+        if text and not matches:
+            st.info(f"No {'' if sentiment == 'any' else sentiment + ' '}reviews mention '{text}'")
+        for match in matches:
+            st.markdown(f"**{match['title']}** · {match['mentions']} mentions "
+                        f"(👍 {match['positive']} · 😐 {match['neutral']} · 👎 {match['negative']})")
+            for review in research_store.review_mentions(
+                    text, match['url'], match['query'], None if sentiment == "any" else sentiment):
+                st.caption(f"“{review[:300]}”")
+        
+        if aspects:
+            import plotly.graph_objects as go
+            names = list(aspects)
+            fig = go.Figure([
+                go.Bar(name=label.title(), y=names, x=[aspects[name][label] for name in names],
+                       orientation="h", marker_color=color)
+                for label, color in (("positive", "#2ca02c"), ("neutral", "#7f7f7f"), ("negative", "#d62728"))
+            ])
+            fig.update_layout(barmode="stack", title="Aspect Sentiment", yaxis=dict(autorange="reversed"),
+                              height=120 + 30 * len(names))
+            st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"Answered from the review index in {elapsed * 1000:.1f} ms")
+
+def ranking_weights_sidebar():
+    """Weight sliders; moving one only re-ranks the cached result set"""
+    from agents.comparative_analysis import ProductScoreWeights
+    defaults = ProductScoreWeights()
+    st.sidebar.header("Ranking Weights")
+    return ProductScoreWeights(
+        price=st.sidebar.slider("Price", 0.0, 1.0, defaults.price, 0.05),
+        features=st.sidebar.slider("Features", 0.0, 1.0, defaults.features, 0.05),
+        sentiment=st.sidebar.slider("Sentiment", 0.0, 1.0, defaults.sentiment, 0.05),
+        popularity=st.sidebar.slider("Popularity", 0.0, 1.0, defaults.popularity, 0.05)
+    )
+
+def get_result_set(data):
+    """Normalized scoring matrix for the current products, built once per shared result set"""
+    return data.derived("scores", lambda shared: get_analysis_agent().prepare(shared["products"]))
+
+def display_startup_report():
+    """Sidebar panel with time to first render and per-rerun overhead"""
+    report = startup_report.summary()
+    with st.sidebar.expander("⏱ Startup Report"):
+        if report['time_to_first_render'] is not None:
+            st.metric("Time to first render", f"{report['time_to_first_render'] * 1000:.0f} ms")
+        if report['last_rerun'] is not None:
+            st.metric("Last rerun", f"{report['last_rerun'] * 1000:.0f} ms")
+            st.metric("Average rerun", f"{report['average_rerun'] * 1000:.0f} ms")
+        for stage, seconds in report['stages'].items():
+            st.caption(f"{stage}: {seconds * 1000:.0f} ms")
+
+def display_trace_panel():
+    """Sidebar debug panel: waterfall of the spans recorded in a recent run"""
+    if not st.sidebar.checkbox("Debug panel", key="debug_panel"):
+        return
+    runs = list(tracer.runs)
+    if not runs:
+        st.sidebar.info("No traced runs yet")
+        return
+    # Default to the latest search rather than the rerun that opened this panel
+    searches = [i for i, run in enumerate(runs) if run.label != "rerun"]
+    default = searches[-1] if searches else len(runs) - 1
+    choice = st.sidebar.selectbox(
+        "Run", range(len(runs)), index=default,
+        format_func=lambda i: f"{runs[i].label} ({time.strftime('%H:%M:%S', time.localtime(runs[i].start))})"
+    )
+    run = runs[choice]
+    if not run.spans:
+        st.sidebar.info("No spans recorded in this run")
+        return
+
+    import plotly.graph_objects as go
+    spans = sorted(run.spans, key=lambda span: span.start)
+    labels = [
+        f"{span.name} · {span.attributes['url'].rsplit('/', 1)[-1]}" if 'url' in span.attributes else span.name
+        for span in spans
+    ]
+    fig = go.Figure(go.Bar(
+        y=[f"{i:02d} {label}" for i, label in enumerate(labels)],
+        x=[span.duration * 1000 for span in spans],
+        base=[(span.start - run.start) * 1000 for span in spans],
+        orientation="h",
+        marker_color=["#d62728" if span.error else "#1f77b4" for span in spans],
+        hovertext=[
+            ", ".join(f"{k}={v}" for k, v in span.attributes.items()) or "-" for span in spans
+        ]
+    ))
+    fig.update_layout(title=f"Trace: {run.label}", xaxis_title="ms since run start",
+                      yaxis=dict(autorange="reversed"), height=120 + 24 * len(spans))
+    with st.expander("🐞 Trace Waterfall", expanded=True):
+        st.plotly_chart(fig, use_container_width=True)
+        st.download_button("Download spans (JSON lines)", tracer.to_json_lines(run),
+                           file_name=f"trace-{run.run_id}.jsonl")
+        st.code(tracer.to_prometheus(), language="text")
+
+def format_age(seconds: float) -> str:
+    if seconds < 90:
+        return "just now"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} min ago"
+    if seconds < 36 * 3600:
+        return f"{seconds / 3600:.0f} h ago"
+    return f"{seconds / 86400:.0f} days ago"
+
+def display_freshness(query: str):
+    """When the shown results were refreshed, and whether by a search, batch run or prefetch"""
+    info = get_research_store().search_info(query)
+    if info:
+        source = {"prefetch": "background refresh", "batch": "batch run"}.get(info['source'], "search")
+        st.caption(f"🕒 Results for '{info['query']}' updated {format_age(info['age'])} by {source}")
+
+def serve_warm_results(query: str) -> bool:
+    """Show stored results for query instead of researching it, if they are recent enough"""
+    info = get_research_store().search_info(query)
+    if not info or info['age'] > config.WARM_RESULTS_MAX_AGE or not get_research_store().count_products(query):
+        return False
+    st.session_state.data = load_data(query)
+    st.info(f"Showing results from {format_age(info['age'])}; tick 'Fresh search' to research again")
+    return True
+
+def display_prefetch_status(prefetcher):
+    if prefetcher is None:
+        return
+    status = prefetcher.status()
+    with st.sidebar.expander("🔄 Background Refresh"):
+        st.caption(f"{status['refreshed']} queries refreshed, {status['failed']} failed, "
+                   f"{status['bytes_last_hour'] / 1024 / 1024:.1f} MiB downloaded in the last hour")
+        if status['paused']:
+            st.caption(f"Paused: {status['paused']}")
+        popular = get_research_store().popular_queries(config.PREFETCH_TOP_K)
+        if popular:
+            import pandas as pd
+            st.dataframe(pd.DataFrame([
+                {'Query': item['query'], 'Searches': item['searches'],
+                 'Updated': format_age(item['age']) if item['age'] is not None else "never"}
+                for item in popular
+            ]), hide_index=True)
+
+def display_sentiment_service():
+    """Sidebar panel with the shared sentiment service's queue and latency, when it is in use"""
+    if not config.SENTIMENT_SERVICE_ADDRESS:
+        return
+    agent = get_research_pipeline().review_agent
+    with st.sidebar.expander("🧮 Sentiment Service"):
+        stats = agent.service_stats()
+        if not stats:
+            st.caption(f"Unreachable at {config.SENTIMENT_SERVICE_ADDRESS}; reviews are scored in this process")
+        else:
+            st.caption(f"{stats['queue_depth']} reviews queued, {stats['workers']} workers, "
+                       f"{stats['mean_batch_size']:.0f} reviews per batch, {stats['rejected']} requests refused")
+            st.caption(f"Latency p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms")
+        client_stats = agent.client_stats()
+        st.caption(f"This process: {client_stats['remote']} reviews scored by the service, "
+                   f"{client_stats['local']} locally")
+
+def display_memory_report(data):
+    """Sidebar panel: bytes per product as dicts vs. shared records"""
+    from utils.records import memory_report, result_sets
+    with st.sidebar.expander("🧠 Memory"):
+        st.caption(f"{result_sets.live()} result sets in memory; "
+                   f"{result_sets.stats['built']} loaded, {result_sets.stats['shared']} reused by another view")
+        if not data.get("products"):
+            return
+        report = data.derived("memory_report", lambda shared: memory_report(shared["products"]))
+        st.metric("Per product", f"{report['after_per_product'] / 1024:.1f} KiB",
+                  f"{report['after_per_product'] - report['before_per_product']:+,.0f} B vs dicts",
+                  delta_color="inverse")
+        # Stored products keep only their review summary, so per-review bytes come from the benchmark run
+        st.caption("Per analyzed review: see the memory line of `python -m benchmarks.run`")
+
+def research_products(query: str):
+    """Search, then research each result and store the finished products.
+
+    The whole search runs under RESEARCH_DEADLINE_SECONDS; products that
+    finished by then are saved even if the rest timed out or failed.
+    """
+    from pipeline import has_features
+    finished = []
+    timed_out = 0
+    with st.spinner("Researching products..."), deadline_scope(config.RESEARCH_DEADLINE_SECONDS) as deadline:
+        try:
+            # Execute full research pipeline
+            st.write("Searching for products...")
+            product_links = get_search_agent().search_products(query, num_results=config.SEARCH_NUM_RESULTS)
+            st.write(f"Found {len(product_links)} product links")
+            
+            live_results = st.empty()
+            for i, link, product in get_research_pipeline().iter_products(product_links):
+                timed_out += product.get('status') == "timeout"
+                if not has_features(product):
+                    st.write(f"Could not process product {i+1} ({product.get('status')}): {link.get('link')}")
+                    continue
+                finished.append((i, product))
+                # Show each product the moment it is ready
+                with live_results.container():
+                    st.write(f"Processed {len(finished)} of {min(len(product_links), config.RESEARCH_MAX_PRODUCTS)} products")
+                    for _, done in finished:
+                        display_product_details(done)
+            live_results.empty()
+            
+        except Exception as e:
+            st.error(f"Error during research: {str(e)}")
+            st.exception(e)
+    
+    if not finished:
+        return
+    products = [product for _, product in sorted(finished, key=lambda item: item[0])]
+    
+    # Save and update data
+    save_data(query, products)
+    st.session_state.data = load_data(query)
+    if timed_out:
+        st.warning(f"The {deadline.seconds:g}s time limit was reached: showing {len(products)} products, "
+                   f"{timed_out} incomplete or missing")
+    else:
+        st.success(f"Successfully processed {len(products)} products")
+
 def main():
     """Main Streamlit app"""
+    rerun_start = time.perf_counter()
     st.set_page_config(page_title="AI Research Assistant", layout="wide")
     st.title("🔍 AI Research Assistant")
+    startup_report.mark_first_render()
+    start_metrics_server()
+    prefetcher = start_prefetcher()
     
     # Initialize session state
     if "data" not in st.session_state:
         st.session_state.data = load_data()
     
     # Search bar
-    with st.form("search_form"):
+    search_form = st.form("search_form")
+    with search_form:
         query = st.text_input("Enter product to research:")
+        fresh = st.checkbox("Fresh search", help="Research again even if recent results are stored")
         submitted = st.form_submit_button("Search")
-        
-        if submitted and query:
-            with st.spinner("Researching products..."):
-                try:
-                    # Execute full research pipeline
-                    st.write("Searching for products...")
-                    product_links = search_agent.search_products(query)
-                    st.write(f"Found {len(product_links)} product links")
-                    
-                    products = []
-                    reviews = []
-                    
-                    for i, link in enumerate(product_links[:3]):  # Limit to 3 products
-                        st.write(f"Processing product {i+1}: {link}")
-                        product = feature_agent.get_product_features(link)
-                        if product:
-                            st.write(f"Extracted features for product {i+1}")
-                            product["review_summary"] = review_agent.analyze_reviews(product.get("reviews", []))
-                            products.append(product)
-                            reviews.extend(product.get("reviews", []))
-                    
-                    # Save and update data
-                    st.session_state.data["products"] = products
-                    st.session_state.data["reviews"] = reviews
-                    save_data(products, reviews)
-                    st.success(f"Successfully processed {len(products)} products")
-                    
-                except Exception as e:
-                    st.error(f"Error during research: {str(e)}")
-                    st.exception(e)
     
-    # Display results
-    if st.session_state.data.get("products"):
-        products = st.session_state.data["products"]
-        
-        # Get analyzed products
-        scored_products = analysis_agent.calculate_product_scores(products)
-        recommendation = recommendation_agent.generate_recommendation(scored_products)
+    # Every rerun is traced; searches are labelled with their query
+    with tracer.run(query if submitted and query else "rerun"):
+        if submitted and query:
+            get_research_store().record_query(query)
+            with search_form:
+                if fresh or not serve_warm_results(query):
+                    research_products(query)
         
-        # Display sections
-        for product in scored_products:
-            display_product_details(product)
-            display_review_insights(product.get("review_summary", {}))
+        # Only the page being viewed is loaded from the store
+        data = st.session_state.data
+        page_count = -(-data.get("total_products", 0) // config.PRODUCTS_PAGE_SIZE)
+        if page_count > 1:
+            page = st.sidebar.number_input("Results page", 1, page_count, data["page"] + 1) - 1
+            if page != data["page"]:
+                st.session_state.data = load_data(data["query"], page)
         
-        display_comparison(scored_products)
-        display_recommendation(recommendation)
+        # Display results
+        if st.session_state.data.get("products"):
+            display_freshness(st.session_state.data["query"])
+            
+            # Get analyzed products
+            weights = ranking_weights_sidebar()
+            scored_products = get_result_set(st.session_state.data).rank(weights)
+            recommendation = get_recommendation_agent().generate_recommendation(scored_products)
+            
+            # Display sections
+            for product in scored_products:
+                display_product_details(product)
+                display_review_insights(product.get("review_summary", {}))
+            
+            display_comparison(scored_products)
+            display_recommendation(recommendation)
+            display_review_explorer(st.session_state.data["query"])
+    
+    startup_report.record_rerun(time.perf_counter() - rerun_start)
+    display_startup_report()
+    display_prefetch_status(prefetcher)
+    display_memory_report(st.session_state.data)
+    display_sentiment_service()
+    display_trace_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+"""Headless batch research: run the app's search and research pipeline over
+a file of queries and store the results where the app reads them.
+
+    python batch.py queries.jsonl -j 8
+    python batch.py queries.jsonl -j 8 --store data/overnight.sqlite
+
+Each input line is a JSON object with a "query" field (or a bare JSON
+string). Finished queries are appended to a checkpoint file after their
+results are committed, so rerunning the same command after a crash or
+Ctrl-C skips them and carries on with the rest.
+"""
+from typing import Dict, Iterator, List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import json
+import os
+import sys
+import time
+from dotenv import load_dotenv
+import config
+from utils.deadline import deadline_scope
+from utils.search_cache import normalize_query
+from utils.telemetry import merge_totals, tracer
+
+# Agents owned by each worker process, created once by _init_worker
+_search_agent = None
+_pipeline = None
+
+def read_queries(path: str, field: str = "query") -> Iterator[str]:
+    """Queries from a JSONL file; blank and malformed lines are skipped"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping line {line_number}: not valid JSON")
+                continue
+            query = item.get(field) if isinstance(item, dict) else item
+            if isinstance(query, str) and query.strip():
+                yield query.strip()
+            else:
+                print(f"Skipping line {line_number}: no '{field}' string")
+
+class Checkpoint:
+    """Append-only record of finished queries, keyed by normalized query"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)['key'])
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue  # a line torn by a crash mid-write
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, query: str) -> bool:
+        return normalize_query(query) in self.done
+
+    def mark(self, query: str, products: int):
+        key = normalize_query(query)
+        self._file.write(json.dumps({'key': key, 'query': query, 'products': products,
+                                     'finished_at': time.time()}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.add(key)
+
+    def close(self):
+        self._file.close()
+
+def _init_worker(sentiment_workers: int):
+    global _search_agent, _pipeline
+    from agents.web_search import WebSearchAgent
+    from agents.feature_extraction import FeatureExtractionAgent
+    from utils.sentiment_service import review_agent
+    from pipeline import ResearchPipeline
+    _search_agent = WebSearchAgent()
+    _pipeline = ResearchPipeline(FeatureExtractionAgent(), review_agent(workers=sentiment_workers))
+
+def research_query(query: str) -> Tuple[List[Dict], Dict]:
+    """Search and research one query in a worker; returns products and stage totals"""
+    with tracer.run(query) as run, deadline_scope(config.RESEARCH_DEADLINE_SECONDS):
+        links = _search_agent.search_products(query, num_results=config.SEARCH_NUM_RESULTS)
+        products = _pipeline.run(links)
+    return products, run.totals()
+
+def pending_queries(path: str, field: str, checkpoint: Checkpoint) -> Tuple[List[str], int]:
+    """Queries not yet finished, with duplicates (after normalization) dropped"""
+    pending, seen, skipped = [], set(), 0
+    for query in read_queries(path, field):
+        key = normalize_query(query)
+        if key in seen:
+            continue
+        seen.add(key)
+        if query in checkpoint:
+            skipped += 1
+        else:
+            pending.append(query)
+    return pending, skipped
+
+def print_report(elapsed: float, finished: int, skipped: int, failed: int, totals: Dict):
+    print(f"\n{finished} queries researched, {skipped} already done, {failed} failed "
+          f"in {elapsed:.1f}s ({finished / elapsed if elapsed else 0:.2f} queries/s)")
+    if not totals:
+        return
+    print(f"\n{'stage':<16}{'calls':>8}{'seconds':>12}{'items':>10}{'bytes':>14}{'cache hits':>12}")
+    for stage, values in sorted(totals.items(), key=lambda item: -item[1].get('seconds', 0)):
+        print(f"{stage:<16}{values.get('count', 0):>8.0f}{values.get('seconds', 0):>12.2f}"
+              f"{values.get('items', 0):>10.0f}{values.get('bytes', 0):>14.0f}{values.get('cache_hits', 0):>12.0f}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="JSONL file of queries")
+    parser.add_argument("-j", "--jobs", type=int, default=config.BATCH_WORKERS,
+                        help="research processes to run in parallel")
+    parser.add_argument("--field", default="query", help="JSON field holding the query")
+    parser.add_argument("--store", default=config.STORE_PATH, help="SQLite research store to write")
+    parser.add_argument("--checkpoint", default=None, help="progress file (default: <store>.checkpoint)")
+    parser.add_argument("--sentiment-workers", type=int, default=config.BATCH_SENTIMENT_WORKERS,
+                        help="sentiment scoring processes per research process")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if not os.getenv("GOOGLE_API") or not os.getenv("SEARCH_ENGINE_ID"):
+        print("Missing GOOGLE_API or SEARCH_ENGINE_ID; set them in the environment or .env")
+        return 2
+
+    from utils.storage import ResearchStore
+    store = ResearchStore(args.store)
+    checkpoint = Checkpoint(args.checkpoint or args.store + ".checkpoint")
+    queries, skipped = pending_queries(args.queries, args.field, checkpoint)
+    print(f"{len(queries)} queries to research, {skipped} already done, {args.jobs} processes")
+
+    totals: Dict[str, Dict[str, float]] = {}
+    finished = failed = 0
+    start = time.perf_counter()
+    remaining = iter(queries)
+    executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                   initargs=(args.sentiment_workers,))
+    try:
+        # Keep a bounded window in flight so results are stored as they finish
+        in_flight: Dict = {}
+        while True:
+            while len(in_flight) < args.jobs * 2:
+                query = next(remaining, None)
+                if query is None:
+                    break
+                in_flight[executor.submit(research_query, query)] = query
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                query = in_flight.pop(future)
+                try:
+                    products, query_totals = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error researching '{query}': {e}")
+                    continue
+                merge_totals(totals, query_totals)
+                if not products:
+                    # Left out of the checkpoint so a resumed run tries again
+                    failed += 1
+                    print(f"No products for '{query}'")
+                    continue
+                store.upsert_products(query, products, replace=True, source="batch")
+                checkpoint.mark(query, len(products))
+                finished += 1
+                print(f"[{finished + failed}/{len(queries)}] {query}: {len(products)} products")
+    except KeyboardInterrupt:
+        print("\nInterrupted; finished queries are checkpointed and will be skipped on resume")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        checkpoint.close()
+
+    print_report(time.perf_counter() - start, finished, skipped, failed, totals)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""Offline benchmark suite for the agents and the end-to-end pipeline.
+
+Everything runs against local stubs and synthetic data, so results are
+comparable between commits on a machine with no network:
+
+    python -m benchmarks.run --review-sizes 100,10000,1000000 --output before.json
+    python -m benchmarks.run --compare before.json
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import platform
+import re
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import config
+
+# The regex-over-raw-HTML spec extractor that structured extraction replaced
+LEGACY_SPEC_PATTERNS = {
+    'brand': r'(brand|manufacturer|made by|by)\s*[:]?\s*([^\n<]+)',
+    'model': r'(model|item)\s*(number|no)?\s*[:]?\s*([^\n<]+)',
+    'weight': r'(weight)\s*[:]?\s*([^\n<]+)',
+    'dimensions': r'(dimensions?|size)\s*[:]?\s*([^\n<]+)'
+}
+
+def legacy_extract_specifications(html: str) -> Dict:
+    specs = {}
+    for name, pattern in LEGACY_SPEC_PATTERNS.items():
+        matches = re.findall(pattern, html, re.IGNORECASE)
+        if matches:
+            specs[name] = matches[0][-1].strip()
+    return specs
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def measure(fn: Callable[[], int], repeat: int) -> Dict:
+    """Time `repeat` calls of fn, then one more under tracemalloc for peak memory.
+
+    fn returns the number of items it processed.
+    """
+    latencies = []
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items += fn()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'calls': repeat,
+        'items': items,
+        'seconds': total,
+        'throughput': items / total if total else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'peak_memory_bytes': peak
+    }
+
+def isolate_caches(workdir: str, warm: bool):
+    """Point every on-disk cache at a scratch directory; disable them unless warm"""
+    config.HTTP_CACHE_PATH = os.path.join(workdir, "http_cache.sqlite")
+    config.SEARCH_CACHE_PATH = os.path.join(workdir, "search_cache.sqlite")
+    config.SENTIMENT_CACHE_PATH = os.path.join(workdir, "sentiment_cache.sqlite")
+    config.STORE_PATH = os.path.join(workdir, "research.sqlite")
+    config.HTTP_CACHE_ENABLED = warm
+    config.SEARCH_CACHE_ENABLED = warm
+    config.SENTIMENT_CACHE_ENABLED = warm
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def single(fn: Callable) -> Callable[[], int]:
+    """Wrap a call that processes one item"""
+    def run() -> int:
+        fn()
+        return 1
+    return run
+
+def throttled_fetch(urls: List[str], scheduler, workers: int) -> Callable[[], int]:
+    """Fetch pages concurrently from a rate-limited stub; counts pages that came back 200"""
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.scraper import fetch_document
+
+    def fetch(url: str) -> int:
+        return int(fetch_document(url, scheduler=scheduler).status_code == 200)
+
+    def run() -> int:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(fetch, urls))
+    return run
+
+def concurrent_sessions(agent, corpus: List[str], sessions: int) -> Callable[[], int]:
+    """Score corpus split across `sessions` threads, as if that many users searched at once"""
+    from concurrent.futures import ThreadPoolExecutor
+    per_session = -(-len(corpus) // sessions)
+    parts = [corpus[i:i + per_session] for i in range(0, len(corpus), per_session)]
+
+    def run() -> int:
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            return sum(len(results) for results in pool.map(agent.score_batch, parts))
+    return run
+
+def build_stages(args, stub, throttled_stub, sentiment_service=None) -> Dict[str, Callable[[], int]]:
+    """Benchmark stages, imported late so agent import cost is not measured"""
+    from agents.web_search import WebSearchAgent
+    from agents.feature_extraction import FeatureExtractionAgent
+    from agents.review_analysis import ReviewAnalysisAgent
+    from agents.comparative_analysis import ComparativeAnalysisAgent
+    from agents.recommendation import RecommendationAgent
+    from pipeline import ResearchPipeline, PipelineConfig
+    from utils.scraper import fetch_document
+    from utils.dedup import cluster_links
+    from utils.scheduler import FetchScheduler
+    from utils.nlp_utils import keyword_corpus
+    from utils.records import SharedResultSet
+    from benchmarks.synthetic import (catalog_columns, product_catalog, researched_products, review_corpus,
+                                      search_candidates)
+
+    search_agent = WebSearchAgent("bench-key", "bench-cx", base_url=stub.search_url)
+    feature_agent = FeatureExtractionAgent()
+    review_agent = ReviewAnalysisAgent(workers=args.workers)
+    analysis_agent = ComparativeAnalysisAgent()
+    recommendation_agent = RecommendationAgent()
+    product_urls = stub.product_urls()
+    documents = [fetch_document(url) for url in product_urls]
+    page_names = list(stub.pages)
+
+    stages = {
+        'search': single(lambda: search_agent.search_products("wireless headphones", num_results=10)),
+        'fetch': lambda: len([fetch_document(url) for url in product_urls]),
+        'spec_extraction': lambda: len([feature_agent.extract_specifications(doc.url, doc) for doc in documents]),
+        'spec_extraction_legacy': lambda: len([legacy_extract_specifications(doc.text) for doc in documents]),
+        'features': lambda: len([feature_agent.get_product_features(url) for url in product_urls]),
+    }
+
+    # One page per call, so p50/p95 are per-page parse times
+    for name, doc in zip(page_names, documents):
+        stages[f'spec_page_{name}'] = single(lambda doc=doc: feature_agent.extract_specifications(doc.url, doc))
+        stages[f'spec_page_legacy_{name}'] = single(lambda doc=doc: legacy_extract_specifications(doc.text))
+
+    descriptions = list(review_corpus(args.description_count, seed=1, duplicate_rate=0))
+
+    def keywords():
+        # One corpus per call, as in a research run
+        with keyword_corpus():
+            return len([feature_agent.analyze_description(text) for text in descriptions])
+    stages['keywords'] = keywords
+
+    for size in args.review_sizes:
+        if size <= args.max_batch_reviews:
+            corpus = list(review_corpus(size))
+            stages[f'reviews_batch_{size}'] = lambda corpus=corpus: (
+                review_agent.analyze_reviews(corpus)['summary']['total_reviews'])
+        stages[f'reviews_stream_{size}'] = lambda size=size: (
+            review_agent.analyze_reviews_stream(review_corpus(size))['summary']['total_reviews'])
+
+    for size in args.catalog_sizes:
+        if size <= args.max_dict_catalog:
+            catalog = product_catalog(size)
+            stages[f'ranking_dicts_{size}'] = lambda catalog=catalog: (
+                len(analysis_agent.calculate_product_scores(catalog)))
+        columns = catalog_columns(size)
+        stages[f'ranking_columns_{size}'] = lambda columns=columns, size=size: (
+            analysis_agent.score_catalog(top_n=10, **columns)[0].size and size)
+
+    top_products = analysis_agent.get_top_products(product_catalog(50), top_n=4)
+    stages['recommendation'] = single(lambda: recommendation_agent.generate_recommendation(top_products))
+
+    # A retailer allowing throttle_rate requests/s and 2 at once, fetched by a scheduler allowed twice
+    # that: its concurrency has to adapt to the 429s, and no page should be lost to them
+    throttled_urls = throttled_stub.product_urls() * args.throttled_pages
+    stages['fetch_throttled'] = throttled_fetch(throttled_urls, FetchScheduler(rate=args.throttle_rate * 2), workers=8)
+
+    candidates = list(search_candidates(args.dedup_candidates))
+    stages['dedup'] = lambda: len(candidates) if cluster_links(candidates) else 0
+
+    # Many sessions scoring at once: each in its own process-local agent vs. through the shared service
+    session_corpus = list(review_corpus(args.session_reviews, seed=2))
+    stages['sentiment_sessions_local'] = concurrent_sessions(review_agent, session_corpus, args.sessions)
+    if sentiment_service is not None:
+        from utils.sentiment_service import SentimentServiceClient
+        client = SentimentServiceClient(sentiment_service.address, authkey=sentiment_service.authkey)
+        stages['sentiment_sessions_service'] = concurrent_sessions(client, session_corpus, args.sessions)
+
+    # Freezing one page of stored results into the record set sessions share
+    stored = researched_products(config.PRODUCTS_PAGE_SIZE)
+    stages['records'] = lambda: len(SharedResultSet("bench", stored, len(stored), 0)['products'])
+
+    # Stub results repeat two pages, so dedup is off to keep every product researched
+    pipeline = ResearchPipeline(feature_agent, review_agent,
+                                PipelineConfig(max_products=args.pipeline_products, dedup=False))
+    stages['pipeline'] = lambda: len(pipeline.run(
+        search_agent.search_products("wireless headphones", num_results=args.pipeline_products)))
+    return stages
+
+def compare(current: Dict, baseline_path: str):
+    """Print throughput and p95 changes against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit', '?')[:10]}):")
+    for name, result in current['stages'].items():
+        before = baseline['stages'].get(name)
+        if not before or 'error' in before or 'error' in result or not before.get('throughput'):
+            continue
+        ratio = result['throughput'] / before['throughput']
+        print(f"  {name:<34} throughput x{ratio:5.2f}   p95 {before['p95_ms']:9.2f} -> {result['p95_ms']:9.2f} ms")
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--review-sizes", default="100,1000,10000",
+                        type=lambda s: [int(float(x)) for x in s.split(",")])
+    parser.add_argument("--catalog-sizes", default="100,10000,1000000",
+                        type=lambda s: [int(float(x)) for x in s.split(",")])
+    parser.add_argument("--max-batch-reviews", type=int, default=100000,
+                        help="larger corpora are only run through the streaming path")
+    parser.add_argument("--max-dict-catalog", type=int, default=100000,
+                        help="larger catalogs are only scored columnar")
+    parser.add_argument("--large-page-bytes", type=int, default=2 * 1024 * 1024,
+                        help="size of the padded retail page added to the fixtures")
+    parser.add_argument("--description-count", type=int, default=2000,
+                        help="product descriptions per keyword extraction call")
+    parser.add_argument("--dedup-candidates", type=int, default=500,
+                        help="search results per near-duplicate clustering call")
+    parser.add_argument("--pipeline-products", type=int, default=5)
+    parser.add_argument("--throttle-rate", type=float, default=20,
+                        help="requests/s the rate-limited stub retailer accepts")
+    parser.add_argument("--throttled-pages", type=int, default=10, help="fetches of each page per throttled call")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions in the sentiment_sessions stages")
+    parser.add_argument("--session-reviews", type=int, default=2000, help="reviews scored across all sessions per call")
+    parser.add_argument("--workers", type=int, default=None, help="sentiment worker processes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stages", default=None, help="comma-separated subset of stage names")
+    parser.add_argument("--warm-caches", action="store_true", help="leave HTTP, search and sentiment caches on")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"))
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    from benchmarks.stubs import StubServer, inflate_page, load_fixtures
+
+    pages = load_fixtures()
+    pages['headphones_large'] = inflate_page(pages['headphones'], args.large_page_bytes)
+
+    with tempfile.TemporaryDirectory() as workdir, StubServer(pages) as stub, \
+            StubServer(pages, latency=0.02, rate_limit=args.throttle_rate, max_concurrent=2) as throttled_stub:
+        isolate_caches(workdir, args.warm_caches)
+        # Both stubs are one local host; only fetch_throttled goes through the politeness scheduler
+        config.SCHEDULER_ENABLED = False
+        sentiment_service = None
+        if not args.stages or 'sentiment_sessions_service' in args.stages.split(","):
+            from utils.sentiment_service import SentimentService
+            sentiment_service = SentimentService(os.path.join(workdir, "sentiment.sock"), workers=args.workers,
+                                                 authkey=secrets.token_bytes(32)).start()
+        stages = build_stages(args, stub, throttled_stub, sentiment_service)
+        selected = args.stages.split(",") if args.stages else list(stages)
+
+        results = {}
+        for name in selected:
+            try:
+                results[name] = measure(stages[name], args.repeat)
+                r = results[name]
+                print(f"{name:<34} {r['throughput'] or 0:14.1f} items/s   p50 {r['p50_ms']:9.2f} ms   "
+                      f"p95 {r['p95_ms']:9.2f} ms   peak {r['peak_memory_bytes'] / 1024:10.0f} KiB")
+            except Exception as e:
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"{name:<34} failed: {results[name]['error']}")
+        if sentiment_service is not None:
+            print(f"\nSentiment service: {sentiment_service.stats()}")
+            sentiment_service.stop()
+
+    from utils.records import memory_report
+    from benchmarks.synthetic import researched_products
+    memory = memory_report(researched_products(config.PRODUCTS_PAGE_SIZE))
+    print(f"\nMemory per product {memory['before_per_product']:,.0f} -> {memory['after_per_product']:,.0f} B, "
+          f"per analyzed review {memory['before_per_review']:,.0f} -> {memory['after_per_review']:,.0f} B")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+        },
+        'stages': results,
+        'memory': memory
+    }
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
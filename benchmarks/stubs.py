@@ -0,0 +1,158 @@
+from typing import Dict, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import json
+import sys
+import threading
+import time
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+def load_fixtures() -> Dict[str, bytes]:
+    """Recorded product pages, keyed by file stem"""
+    return {path.stem: path.read_bytes() for path in sorted(FIXTURES_DIR.glob("*.html"))}
+
+def inflate_page(page: bytes, target_bytes: int) -> bytes:
+    """Pad a page with inline scripts and styles, the way large retail pages are"""
+    filler = (
+        b"<script>window.__STATE__ = {\"brand\": \"tracking\", \"size\": \"" + b"x" * 400 + b"\"};</script>\n"
+        b"<style>.c{margin:0;padding:0;weight:400}</style>\n"
+    )
+    head_end = page.find(b"</head>")
+    padding = filler * max(0, (target_bytes - len(page)) // len(filler))
+    return page[:head_end] + padding + page[head_end:] if head_end >= 0 else page + padding
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that stop reading early close mid-response; that is expected here
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """Local HTTP server in a background thread for offline benchmarks.
+
+    Serves fixture product pages under /products/<name> and a stand-in for
+    the Custom Search endpoint under /customsearch/v1 that links to them.
+    With rate_limit set, product pages behave like a retailer that throttles
+    scrapers: beyond rate_limit requests per second (or max_concurrent at
+    once) it answers 429 with a Retry-After header. robots is served as
+    /robots.txt when given.
+    """
+
+    def __init__(self, pages: Dict[str, bytes] = None, latency: float = 0.0, results_per_query: int = 10,
+                 rate_limit: float = 0.0, max_concurrent: int = 0, retry_after: int = 1, robots: bytes = None):
+        self.pages = pages if pages is not None else load_fixtures()
+        self.latency = latency
+        self.results_per_query = results_per_query
+        self.rate_limit = rate_limit
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.robots = robots
+        self.requests = 0
+        self.throttled = 0
+        self._active = 0
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.base_url}/customsearch/v1"
+
+    def product_urls(self) -> List[str]:
+        return [f"{self.base_url}/products/{name}" for name in self.pages]
+
+    def _admit(self) -> bool:
+        """Take a request slot, or count the request as throttled"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            if self._tokens < 1 or (self.max_concurrent and self._active >= self.max_concurrent):
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            self._active += 1
+            return True
+
+    def _done(self):
+        with self._lock:
+            self._active -= 1
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _search_body(self, query: str, num: int) -> bytes:
+        names = list(self.pages)
+        items = [
+            {
+                'title': f"{query} - {names[i % len(names)]} #{i}",
+                'link': f"{self.base_url}/products/{names[i % len(names)]}?variant={i}",
+                'snippet': f"Result {i} for {query}"
+            }
+            for i in range(min(num, self.results_per_query))
+        ]
+        return json.dumps({'items': items}).encode('utf-8')
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let delayed ACKs stall them
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub.requests += 1
+                parts = urlsplit(self.path)
+                name = parts.path[len("/products/"):] if parts.path.startswith("/products/") else None
+                if name in stub.pages and stub.rate_limit:
+                    if not stub._admit():
+                        self._send(429, b"too many requests", "text/plain", {'Retry-After': str(stub.retry_after)})
+                        return
+                    try:
+                        self._respond(parts, name)
+                    finally:
+                        stub._done()
+                else:
+                    self._respond(parts, name)
+
+            def _respond(self, parts, name: str):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if parts.path == "/customsearch/v1":
+                    params = parse_qs(parts.query)
+                    body = stub._search_body(params.get('q', [''])[0], int(params.get('num', ['10'])[0]))
+                    self._send(200, body, "application/json")
+                elif parts.path == "/robots.txt" and stub.robots is not None:
+                    self._send(200, stub.robots, "text/plain")
+                elif name in stub.pages:
+                    self._send(200, stub.pages[name], "text/html; charset=utf-8")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Dict = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
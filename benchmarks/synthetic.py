@@ -0,0 +1,109 @@
+from typing import Dict, Iterator, List
+import random
+import numpy as np
+
+_POSITIVE = ["amazing", "great", "excellent", "love", "perfect", "comfortable", "reliable", "fast"]
+_NEGATIVE = ["terrible", "broke", "awful", "disappointed", "cheap", "slow", "noisy", "returned"]
+_ASPECTS = ["battery", "sound", "price", "quality", "design", "shipping", "screen", "motor", "lid", "fit"]
+_FILLER = ["the", "it", "after", "days", "works", "really", "product", "with", "and", "for"]
+_NOISE = ["<br>", "http://example.com/r", "@seller", "#deal", "5", "2024"]
+
+def review_corpus(size: int, seed: int = 0, duplicate_rate: float = 0.1) -> Iterator[str]:
+    """Yield `size` synthetic reviews; a share of them repeat earlier text like syndicated reviews"""
+    rng = random.Random(seed)
+    seen: List[str] = []
+    for _ in range(size):
+        if seen and rng.random() < duplicate_rate:
+            yield rng.choice(seen)
+            continue
+        mood = _POSITIVE if rng.random() < 0.6 else _NEGATIVE
+        words = [rng.choice(mood), rng.choice(_ASPECTS)] + rng.choices(_FILLER, k=rng.randint(4, 20))
+        words += rng.choices(mood + _ASPECTS, k=rng.randint(1, 4))
+        if rng.random() < 0.2:
+            words.append(rng.choice(_NOISE))
+        rng.shuffle(words)
+        text = " ".join(words).capitalize() + "."
+        if len(seen) < 1000:
+            seen.append(text)
+        yield text
+
+def product_catalog(size: int, seed: int = 0) -> List[Dict]:
+    """Product dicts shaped like pipeline output, for ComparativeAnalysisAgent"""
+    rng = random.Random(seed)
+    return [
+        {
+            'title': f"Product {i}",
+            'url': f"https://shop.example/p/{i}",
+            'price': f"${rng.uniform(5, 2000):,.2f}",
+            'key_features': rng.sample(_ASPECTS, rng.randint(0, len(_ASPECTS))),
+            'review_summary': {
+                'average_polarity': rng.uniform(-1, 1),
+                'total_reviews': rng.randint(0, 5000)
+            }
+        }
+        for i in range(size)
+    ]
+
+def catalog_columns(size: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """The same inputs as product_catalog, already columnar"""
+    rng = np.random.default_rng(seed)
+    return {
+        'price': rng.uniform(5, 2000, size),
+        'features': rng.integers(0, len(_ASPECTS) + 1, size),
+        'sentiment': rng.uniform(-1, 1, size),
+        'popularity': rng.integers(0, 5000, size)
+    }
+
+_BRANDS = ["Sony", "Bose", "Anker", "Ninja", "Dyson", "Shark", "Apple", "Samsung"]
+_RETAILERS = [("amazon.com", "Amazon.com"), ("bestbuy.com", "Best Buy"), ("walmart.com", "Walmart.com"),
+              ("target.com", "Target")]
+
+def search_candidates(size: int, seed: int = 0, listings: int = 3) -> Iterator[Dict]:
+    """Search results in which each product appears at up to `listings` retailers"""
+    rng = random.Random(seed)
+    for i in range(size):
+        product = i // listings if rng.random() < 0.8 else size + i
+        brand = _BRANDS[product % len(_BRANDS)]
+        model = f"{brand[:2].upper()}-{product * 7 % 9000 + 1000}X"
+        domain, retailer = rng.choice(_RETAILERS)
+        aspects = random.Random(product).sample(_ASPECTS, 4)
+        yield {
+            'title': f"{brand} {model} {' '.join(aspects[:2]).title()} Edition - {retailer}",
+            'link': f"https://www.{domain}/p/{product}?utm_source=google&ref={i}",
+            'snippet': f"Shop the {brand} {model} with great {aspects[2]} and {aspects[3]} at {retailer}."
+        }
+
+def researched_products(size: int, reviews_per_product: int = 50, seed: int = 0) -> List[Dict]:
+    """Product dicts as the pipeline stored them before review scores were columnar:
+    specifications, features, raw reviews and an analysis carrying every cleaned review text"""
+    rng = random.Random(seed)
+    products = []
+    for i in range(size):
+        brand = _BRANDS[i % len(_BRANDS)]
+        reviews = list(review_corpus(reviews_per_product, seed=seed + i))
+        analyses = []
+        for review in reviews:
+            compound = rng.uniform(-1, 1)
+            analyses.append({
+                'vader': {'compound': compound, 'positive': max(compound, 0), 'negative': max(-compound, 0),
+                          'neutral': 1 - abs(compound)},
+                'textblob': {'polarity': compound * 0.8, 'subjectivity': rng.random()},
+                'text': review.lower()
+            })
+        products.append({
+            'title': f"{brand} Model {i} Wireless Headphones",
+            'url': f"https://shop.example/p/{i}",
+            'price': f"${rng.uniform(5, 2000):,.2f}",
+            'specifications': {'brand': brand, 'model': f"{brand[:2].upper()}-{i}", 'weight': "250 g",
+                               'color': rng.choice(["Black", "Silver", "White"])},
+            'key_features': rng.sample(_ASPECTS, rng.randint(2, 6)),
+            'sources': [f"https://shop.example/p/{i}"],
+            'status': "ok",
+            'reviews': reviews,
+            'review_summary': {
+                'reviews': analyses,
+                'summary': {'total_reviews': len(reviews), 'average_polarity': rng.uniform(-1, 1)},
+                'common_themes': rng.sample(_ASPECTS, 5)
+            }
+        })
+    return products
@@ -0,0 +1,119 @@
+import os
+
+# HTTP client settings shared by every agent
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "20"))  # number of hosts kept pooled
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # keep-alive connections per host
+HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "AI-Research-Assistant/1.0")
+
+# Product pages are streamed; reading stops once the needed fields are parsed or the budget is spent
+FETCH_BYTE_BUDGET = int(os.getenv("FETCH_BYTE_BUDGET", str(1024 * 1024)))  # decoded bytes per page, 0 = unlimited
+FETCH_CHUNK_BYTES = int(os.getenv("FETCH_CHUNK_BYTES", str(16 * 1024)))
+
+# Per-query time budget: when it runs out, the products finished so far are returned (0 = no limit)
+RESEARCH_DEADLINE_SECONDS = float(os.getenv("RESEARCH_DEADLINE_SECONDS", "45"))
+# Hedged page fetches: a duplicate request goes out once the first outlasts the host's recent p95 latency
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))  # requests to a host before hedging starts
+HEDGE_LATENCY_WINDOW = int(os.getenv("HEDGE_LATENCY_WINDOW", "200"))  # recent latencies kept per host
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "0"))  # 0: twice the research and prefetch fetch threads
+
+# Per-domain politeness for page fetches (utils/scheduler.py)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_DOMAIN_RATE = float(os.getenv("SCHEDULER_DOMAIN_RATE", "4"))  # requests per second per domain
+SCHEDULER_DOMAIN_BURST = float(os.getenv("SCHEDULER_DOMAIN_BURST", "4"))
+SCHEDULER_INITIAL_CONCURRENCY = float(os.getenv("SCHEDULER_INITIAL_CONCURRENCY", "2"))  # per domain
+SCHEDULER_MAX_CONCURRENCY = float(os.getenv("SCHEDULER_MAX_CONCURRENCY", "6"))
+SCHEDULER_SLOW_SECONDS = float(os.getenv("SCHEDULER_SLOW_SECONDS", "1"))  # slower responses may shrink the limit
+SCHEDULER_MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "2"))  # retries after a 429/503
+SCHEDULER_MAX_RETRY_AFTER = float(os.getenv("SCHEDULER_MAX_RETRY_AFTER", "30"))  # longer waits are not retried
+ROBOTS_ENABLED = os.getenv("ROBOTS_ENABLED", "1") == "1"
+ROBOTS_TTL = int(os.getenv("ROBOTS_TTL", str(24 * 3600)))  # seconds
+
+# Research pipeline settings
+SEARCH_NUM_RESULTS = int(os.getenv("SEARCH_NUM_RESULTS", "5"))
+RESEARCH_MAX_PRODUCTS = int(os.getenv("RESEARCH_MAX_PRODUCTS", "3"))
+RESEARCH_MAX_WORKERS = int(os.getenv("RESEARCH_MAX_WORKERS", "8"))  # products researched concurrently
+# Near-duplicate search results (same product at several retailers) are researched once
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))  # SimHash bits
+# Description keywords are ranked against one run's descriptions; outside a run, against at most this many
+KEYWORD_MAX_DOCUMENTS = int(os.getenv("KEYWORD_MAX_DOCUMENTS", "1000"))
+
+# On-disk HTTP response cache for product pages
+DATA_DIR = os.getenv("DATA_DIR", "data")
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(DATA_DIR, "http_cache.sqlite"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HTTP_CACHE_DEFAULT_TTL = int(os.getenv("HTTP_CACHE_DEFAULT_TTL", "3600"))  # seconds
+# Per-domain TTL overrides, e.g. "amazon.com=600,bestbuy.com=1800"
+HTTP_CACHE_DOMAIN_TTLS = {
+    domain.strip(): int(ttl)
+    for domain, ttl in (
+        item.split("=") for item in os.getenv("HTTP_CACHE_DOMAIN_TTLS", "").split(",") if "=" in item
+    )
+}
+
+# Search result cache and Custom Search quota accounting
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "https://www.googleapis.com/customsearch/v1")
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", os.path.join(DATA_DIR, "search_cache.sqlite"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))  # seconds
+SEARCH_DAILY_QUOTA = int(os.getenv("SEARCH_DAILY_QUOTA", "100"))  # API calls per UTC day
+
+# Review sentiment scoring
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_PARALLEL_MIN_REVIEWS = int(os.getenv("SENTIMENT_PARALLEL_MIN_REVIEWS", "2000"))  # below this, score in-process
+SENTIMENT_CHUNK_SIZE = int(os.getenv("SENTIMENT_CHUNK_SIZE", "500"))
+
+# Sentiment memoization keyed on cleaned review text
+SENTIMENT_CACHE_ENABLED = os.getenv("SENTIMENT_CACHE_ENABLED", "1") == "1"
+SENTIMENT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", os.path.join(DATA_DIR, "sentiment_cache.sqlite"))
+SENTIMENT_MEMO_SIZE = int(os.getenv("SENTIMENT_MEMO_SIZE", "50000"))  # entries held in memory
+THEME_SKETCH_SIZE = int(os.getenv("THEME_SKETCH_SIZE", "2000"))  # counters kept when streaming review themes
+
+# Shared sentiment service (utils/sentiment_service.py): one scoring pool per host.
+# Set to the service's Unix socket path (or host:port); empty scores in each process.
+SENTIMENT_SERVICE_ADDRESS = os.getenv("SENTIMENT_SERVICE_ADDRESS", "")
+SENTIMENT_SERVICE_SOCKET = os.getenv("SENTIMENT_SERVICE_SOCKET", os.path.join(DATA_DIR, "sentiment_service.sock"))
+# Messages are unpickled, so connections must prove this key. When unset, the service
+# generates a random key into SENTIMENT_SERVICE_KEY_FILE (mode 0600) and clients read it there.
+SENTIMENT_SERVICE_AUTHKEY = os.getenv("SENTIMENT_SERVICE_AUTHKEY", "")
+SENTIMENT_SERVICE_KEY_FILE = os.getenv("SENTIMENT_SERVICE_KEY_FILE", os.path.join(DATA_DIR, "sentiment_service.key"))
+SENTIMENT_SERVICE_MAX_QUEUE = int(os.getenv("SENTIMENT_SERVICE_MAX_QUEUE", "20000"))  # texts waiting before requests are refused
+SENTIMENT_SERVICE_BATCH_SIZE = int(os.getenv("SENTIMENT_SERVICE_BATCH_SIZE", "256"))  # texts per micro-batch
+SENTIMENT_SERVICE_BATCH_WAIT = float(os.getenv("SENTIMENT_SERVICE_BATCH_WAIT", "0.005"))  # seconds a batch waits to fill
+SENTIMENT_SERVICE_TIMEOUT = float(os.getenv("SENTIMENT_SERVICE_TIMEOUT", "30"))  # seconds before scoring in-process
+
+# Research results store
+STORE_PATH = os.getenv("STORE_PATH", os.path.join(DATA_DIR, "research.sqlite"))
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "20"))
+
+# NLTK data: checked at startup instead of downloaded on import.
+# Set NLTK_AUTO_DOWNLOAD=1 to let a missing resource be fetched once.
+NLTK_AUTO_DOWNLOAD = os.getenv("NLTK_AUTO_DOWNLOAD", "0") == "1"
+
+# Background prefetch of popular queries (utils/prefetch.py); off unless enabled here or run as a sidecar
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "20"))  # popular queries kept warm
+PREFETCH_INTERVAL = int(os.getenv("PREFETCH_INTERVAL", "600"))  # seconds between refresh cycles
+PREFETCH_MAX_AGE = int(os.getenv("PREFETCH_MAX_AGE", str(6 * 3600)))  # results older than this are refreshed
+PREFETCH_QUOTA_RESERVE = int(os.getenv("PREFETCH_QUOTA_RESERVE", "50"))  # search calls always left for users
+PREFETCH_BUSY_SHARE = float(os.getenv("PREFETCH_BUSY_SHARE", "0.25"))  # fraction of wall time spent refreshing
+PREFETCH_MAX_BYTES_PER_HOUR = int(os.getenv("PREFETCH_MAX_BYTES_PER_HOUR", str(200 * 1024 * 1024)))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))  # concurrent page fetches per refresh
+# Background refreshes have no one waiting, so they get longer than an interactive search
+PREFETCH_DEADLINE_SECONDS = float(os.getenv("PREFETCH_DEADLINE_SECONDS", "300"))
+# Seconds; stored popularity scores are scaled by it, so changing it re-weights past searches
+QUERY_LOG_HALF_LIFE = float(os.getenv("QUERY_LOG_HALF_LIFE", str(7 * 24 * 3600)))
+# Submitted searches with stored results younger than this are served from the store
+WARM_RESULTS_MAX_AGE = int(os.getenv("WARM_RESULTS_MAX_AGE", str(6 * 3600)))
+
+# Tracing: per-stage totals are served at http://127.0.0.1:METRICS_PORT/metrics (0 disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Headless batch runs (batch.py)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))  # research processes
+BATCH_SENTIMENT_WORKERS = int(os.getenv("BATCH_SENTIMENT_WORKERS", "1"))  # scoring processes per research process
@@ -0,0 +1,133 @@
+from typing import Dict, Iterator, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from contextvars import copy_context
+from dataclasses import dataclass, field
+import config
+from agents.feature_extraction import FeatureExtractionAgent
+from agents.review_analysis import ReviewAnalysisAgent
+from utils.deadline import current_deadline
+from utils.dedup import cluster_links
+from utils.nlp_utils import keyword_corpus
+from utils.scheduler import interleave_by_domain
+from utils.telemetry import tracer
+
+# In-flight fetches stop reading at the deadline; this long is allowed for them to hand back what they parsed
+DEADLINE_GRACE_SECONDS = 0.5
+
+def has_features(product: Dict) -> bool:
+    """True for products whose feature extraction finished, whatever their status"""
+    return 'specifications' in product
+
+@dataclass
+class PipelineConfig:
+    max_products: int = field(default_factory=lambda: config.RESEARCH_MAX_PRODUCTS)
+    max_workers: int = field(default_factory=lambda: config.RESEARCH_MAX_WORKERS)
+    dedup: bool = field(default_factory=lambda: config.DEDUP_ENABLED)
+
+class ResearchPipeline:
+    """Fans feature extraction and review analysis out over a thread pool.
+
+    Page fetches dominate a research run and release the GIL, so products
+    are researched concurrently and handed back in completion order. Search
+    results listing the same product are clustered first, so each product
+    takes one slot and one fetch; the other listings' URLs are recorded in
+    the product's sources.
+
+    Every product comes back with a status: "ok", "error", or "timeout" when
+    the run's deadline (see utils.deadline) passed before it was finished.
+    A timed-out product keeps whatever features were extracted in time.
+    """
+
+    def __init__(self, feature_agent: FeatureExtractionAgent, review_agent: ReviewAnalysisAgent,
+                 config: PipelineConfig = None):
+        self.feature_agent = feature_agent
+        self.review_agent = review_agent
+        self.config = config or PipelineConfig()
+
+    def research_product(self, link: Union[Dict, str], duplicates: List[Dict] = ()) -> Dict:
+        """Extract features and analyze reviews for one search result, noting its duplicate listings as sources"""
+        if isinstance(link, str):
+            link = {'link': link}
+        url = link.get('link')
+
+        deadline = current_deadline()
+        with tracer.span("product", url=url, duplicates=len(duplicates)):
+            product = self.feature_agent.get_product_features(url)
+            if not product:
+                if deadline is not None and deadline.expired:
+                    return failed_product(link, "timeout", f"Unfinished after the {deadline.seconds:g}s deadline")
+                return failed_product(link, "error", "Could not extract product features")
+
+            product.setdefault('title', link.get('title') or url)
+            product.setdefault('url', url)
+            product.setdefault('snippet', link.get('snippet'))
+            if duplicates:
+                product['sources'] = [url] + [duplicate.get('link') for duplicate in duplicates]
+            if deadline is not None and deadline.expired:
+                product['review_summary'] = {}
+                product['status'] = "timeout"
+                return product
+            product['review_summary'] = self.review_agent.analyze_reviews(product.get('reviews', []))
+            product['status'] = "ok"
+            return product
+
+    def group_links(self, product_links: List[Dict]) -> List[List[Dict]]:
+        """Search results grouped into one list per distinct product, best-ranked listing first"""
+        product_links = [{'link': link} if isinstance(link, str) else link for link in product_links]
+        if not self.config.dedup:
+            return [[link] for link in product_links]
+        with tracer.span("dedup", items=len(product_links)) as span:
+            clusters = cluster_links(product_links)
+            span.attributes['duplicates'] = len(product_links) - len(clusters)
+        return [[product_links[i] for i in cluster] for cluster in clusters]
+
+    def iter_products(self, product_links: List[Dict]) -> Iterator[Tuple[int, Dict, Dict]]:
+        """Yield (index, link, product) for each distinct product as soon as it finishes.
+
+        Products still running when the current deadline passes are yielded
+        last, as timeouts, without waiting for them.
+        """
+        groups = self.group_links(product_links)[:self.config.max_products]
+        if not groups:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self.config.max_workers, len(groups)))
+        try:
+            # Each task runs in a copy of the caller's context so its spans join the active trace run.
+            # Submitting round-robin across domains keeps one retailer's limits from idling the pool.
+            # The copied contexts also carry this run's keyword corpus, so IDF weights are per search.
+            with keyword_corpus():
+                futures = {
+                    executor.submit(copy_context().run, self.research_product, group[0], group[1:]): (i, group[0])
+                    for i, group in interleave_by_domain(list(enumerate(groups)),
+                                                         lambda item: item[1][0].get('link') or "")
+                }
+            deadline = current_deadline()
+            timeout = deadline.remaining() + DEADLINE_GRACE_SECONDS if deadline is not None else None
+            pending = dict(futures)
+            try:
+                for future in as_completed(futures, timeout=timeout):
+                    i, link = pending.pop(future)
+                    try:
+                        product = future.result()
+                    except Exception as e:
+                        print(f"Error researching product {link}: {e}")
+                        product = failed_product(link, "error", str(e))
+                    yield i, link, product
+            except FutureTimeout:
+                for i, link in pending.values():
+                    yield i, link, failed_product(link, "timeout", f"Unfinished after the {deadline.seconds:g}s deadline")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, product_links: List[Dict]) -> List[Dict]:
+        """Research all products and return them in search-result order"""
+        finished = sorted(
+            ((i, product) for i, _, product in self.iter_products(product_links) if has_features(product)),
+            key=lambda item: item[0]
+        )
+        return [product for _, product in finished]
+
+def failed_product(link: Dict, status: str, error: str) -> Dict:
+    """Placeholder for a product that could not be researched"""
+    return {'title': link.get('title') or link.get('link'), 'url': link.get('link'), 'status': status, 'error': error}
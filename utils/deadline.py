@@ -0,0 +1,62 @@
+from typing import Optional, Tuple, Union
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+Timeout = Union[float, Tuple[float, float]]
+
+class DeadlineExceeded(TimeoutError):
+    """The research run's time budget ran out before this step could start"""
+
+class Deadline:
+    """A point in time by which a research run has to hand back its results"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, step: str = "step"):
+        """Raise DeadlineExceeded if there is no time left for step"""
+        if self.expired:
+            raise DeadlineExceeded(f"{self.seconds:g}s deadline passed before {step}")
+
+    def timeout(self, timeout: Timeout) -> Timeout:
+        """A requests timeout (single or connect/read pair) cut down to the time remaining"""
+        self.check("the request")
+        remaining = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the run active in this context, if any"""
+    return _current_deadline.get()
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Bound every agent call inside this block to `seconds` (None or 0 for no limit).
+
+    Like trace runs, the deadline lives in a context variable, so threads
+    started with contextvars.copy_context see it too.
+    """
+    deadline = Deadline(seconds) if seconds else None
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def check_deadline(step: str = "step"):
+    """Raise DeadlineExceeded if the current run's deadline has passed"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(step)
@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import functools
+import hashlib
+import re
+import numpy as np
+import config
+from utils.nlp_utils import STOP_WORDS, WORD_RE, tokenize
+from utils.spec_extraction import FALLBACK_PATTERNS
+
+# Retailer suffixes Google appends to titles: "Sony WH-1000XM5 ... - Amazon.com", "... | Best Buy"
+TITLE_SUFFIX_RE = re.compile(r"\s+[-|:–]\s+[^-|:–\d]{1,40}$")
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = re.compile(r"utm_.*|ref|ref_|tag|gclid|fbclid|msclkid|psc|th|srsltid|_encoding", re.IGNORECASE)
+# Model-like tokens: letters and digits together, e.g. WH-1000XM5, QC45, A2783
+MODEL_TOKEN_RE = re.compile(r"\b(?=[a-z0-9-]*[a-z])(?=[a-z0-9-]*\d)[a-z0-9]+(?:-[a-z0-9]+)*\b", re.IGNORECASE)
+# Sizes, capacities and generations that look like model numbers but are shared across products
+NOT_MODEL_RE = re.compile(r"\d+(?:st|nd|rd|th|gb|tb|mb|mah|mm|cm|in|inch|w|hz|khz|mhz|ghz|k|p|mp|v|oz|lbs?|g|kg|ml|l|pack|pcs?|x)", re.IGNORECASE)
+TITLE_WEIGHT = 3
+# Same-model listings are still compared, so an accessory "for WH-1000XM5" is not merged into the product
+MODEL_MAX_DISTANCE = 16
+SIGNATURE_BITS = 64
+_BIT_SHIFTS = np.arange(SIGNATURE_BITS, dtype=np.uint64)
+
+def canonical_url(url: str) -> str:
+    """Host, path and sorted non-tracking query parameters; scheme, www. and fragment dropped"""
+    parts = urlsplit(url or "")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    params = sorted((key, value) for key, value in parse_qsl(parts.query) if not TRACKING_PARAMS.fullmatch(key))
+    return host + parts.path.rstrip("/").lower() + (f"?{urlencode(params)}" if params else "")
+
+def clean_title(title: str) -> str:
+    return TITLE_SUFFIX_RE.sub("", title or "")
+
+def model_number(text: str) -> Optional[str]:
+    """Model number from a "Model: ..." label, else the first model-like token of the text"""
+    match = FALLBACK_PATTERNS['model'].search(text or "")
+    candidates = [match.groups()[-1]] if match else []
+    candidates += [token.group() for token in MODEL_TOKEN_RE.finditer(text or "")]
+    for candidate in candidates:
+        token = MODEL_TOKEN_RE.search(candidate)
+        if token and len(token.group()) >= 4 and not NOT_MODEL_RE.fullmatch(token.group()):
+            return re.sub(r"[^0-9A-Z]", "", token.group().upper())
+    return None
+
+def shingles(text: str, weight: int) -> Dict[str, int]:
+    """Weighted word unigrams and bigrams of a text"""
+    words = [token for token in tokenize(text) if token not in STOP_WORDS and
+             (WORD_RE.fullmatch(token) or MODEL_TOKEN_RE.fullmatch(token))]
+    features: Dict[str, int] = defaultdict(int)
+    for i, word in enumerate(words):
+        features[word] += weight
+        if i:
+            features[f"{words[i - 1]} {word}"] += weight
+    return features
+
+@functools.lru_cache(maxsize=65536)
+def feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(features: Dict[str, int]) -> int:
+    """64-bit SimHash: near-identical feature sets differ in only a few bits"""
+    hashes = np.fromiter((feature_hash(feature) for feature in features), dtype=np.uint64, count=len(features))
+    bits = (hashes[:, None] >> _BIT_SHIFTS & np.uint64(1)).astype(np.int64)
+    weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    # Each feature votes +weight for its set bits and -weight for the rest
+    counts = weights @ (2 * bits - 1)
+    return int(((counts > 0).astype(np.uint64) << _BIT_SHIFTS).sum())
+
+def link_signature(link: Dict) -> Optional[int]:
+    """SimHash of a search result's title (weighted up) and snippet; None when both are empty"""
+    features = shingles(clean_title(link.get('title')), TITLE_WEIGHT)
+    for feature, weight in shingles(link.get('snippet') or "", 1).items():
+        features[feature] += weight
+    return simhash(features) if features else None
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        # The better-ranked (lower) index stays the root
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+def cluster_links(links: List[Dict], max_distance: int = None) -> List[List[int]]:
+    """Group search results that describe the same product.
+
+    Results join a cluster when their canonical URLs match, when their model
+    numbers match and their SimHash signatures are not far apart, or when the
+    signatures are within max_distance bits. Signatures are split into
+    max_distance + 1 bands, so any pair that close shares at least one band
+    exactly and only pairs sharing a band are compared.
+    Clusters come back in search-rank order, each listing indices by rank.
+    """
+    max_distance = config.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+    bands = max_distance + 1
+    width = SIGNATURE_BITS // bands
+    groups = UnionFind(len(links))
+    signatures = []
+    buckets: Dict[tuple, List[int]] = defaultdict(list)
+
+    for i, link in enumerate(links):
+        keys = [('url', canonical_url(link.get('link')))]
+        signature = link_signature(link)
+        signatures.append(signature)
+        if signature is not None:
+            # A result with no text only matches on its URL
+            model = model_number(clean_title(link.get('title'))) or model_number(link.get('snippet'))
+            if model:
+                keys.append(('model', model))
+            keys += [('band', band, signature >> (band * width) & ((1 << width) - 1)) for band in range(bands)]
+
+        for key in keys:
+            for j in buckets[key]:
+                if key[0] == 'url':
+                    groups.union(i, j)
+                    continue
+                limit = MODEL_MAX_DISTANCE if key[0] == 'model' else max_distance
+                if bin(signature ^ signatures[j]).count("1") <= limit:
+                    groups.union(i, j)
+            buckets[key].append(i)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(links)):
+        clusters[groups.find(i)].append(i)
+    return sorted(clusters.values())
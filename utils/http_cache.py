@@ -0,0 +1,197 @@
+from typing import Dict, Optional
+from dataclasses import dataclass, replace
+from urllib.parse import urlsplit
+import json
+import os
+import sqlite3
+import threading
+import time
+import config
+
+# Headers a 304 may send that replace the stored response's own
+REVALIDATION_HEADERS = ('etag', 'last-modified', 'cache-control', 'expires')
+
+@dataclass
+class CacheEntry:
+    url: str
+    status_code: int
+    headers: Dict
+    content: bytes
+    encoding: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    # Set for a body cut short once a spec parser had everything; names that parser's needs
+    partial_for: Optional[str] = None
+
+class HttpCache:
+    """SQLite-backed cache of fetched pages.
+
+    Entries are fresh for a per-domain TTL, revalidated with ETag /
+    Last-Modified once stale, and evicted least-recently-used first when
+    the stored bodies exceed the byte cap. A partial entry holds only the
+    start of a page, enough for the spec parser it was read for.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None,
+                 default_ttl: int = None, domain_ttls: Dict[str, int] = None):
+        self.path = path or config.HTTP_CACHE_PATH
+        self.max_bytes = max_bytes or config.HTTP_CACHE_MAX_BYTES
+        self.default_ttl = default_ttl if default_ttl is not None else config.HTTP_CACHE_DEFAULT_TTL
+        self.domain_ttls = domain_ttls if domain_ttls is not None else config.HTTP_CACHE_DOMAIN_TTLS
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER,
+                headers TEXT,
+                content BLOB,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                accessed_at REAL,
+                size INTEGER,
+                partial_for TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+
+    def ttl_for(self, url: str) -> int:
+        """TTL for a url, using the most specific matching domain override"""
+        host = urlsplit(url).hostname or ""
+        best, best_len = self.default_ttl, -1
+        for domain, ttl in self.domain_ttls.items():
+            if (host == domain or host.endswith("." + domain)) and len(domain) > best_len:
+                best, best_len = ttl, len(domain)
+        return best
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Whether an entry can be served without contacting the origin"""
+        return time.time() - entry.stored_at < self.ttl_for(entry.url)
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Look up a stored response and mark it recently used"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status_code, headers, content, encoding, etag, last_modified, stored_at, partial_for "
+                "FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return CacheEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6], row[7], row[8])
+
+    def validators(self, entry: Optional[CacheEntry]) -> Dict:
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(self, url: str, status_code: int, headers: Dict, content: bytes, encoding: Optional[str] = None,
+            partial_for: Optional[str] = None):
+        """Store a response, evicting old entries if over the byte cap"""
+        lowered = {key.lower(): value for key, value in headers.items()}
+        if 'no-store' in lowered.get('cache-control', '').lower():
+            return
+        # Bodies are stored decoded, so transfer headers no longer apply
+        headers = {key: value for key, value in headers.items()
+                   if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+        now = time.time()
+        size = len(content)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status_code, json.dumps(headers), content, encoding,
+                 lowered.get('etag'), lowered.get('last-modified'), now, now, size, partial_for)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._stats['stores'] += 1
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, entry: CacheEntry, headers: Dict = None) -> CacheEntry:
+        """Restart the TTL of an entry the origin confirmed is unchanged.
+
+        Validators and freshness headers sent with the 304 replace the stored
+        ones, so the next revalidation uses the current ETag.
+        """
+        updates = {key: value for key, value in (headers or {}).items() if key.lower() in REVALIDATION_HEADERS}
+        replaced = {key.lower() for key in updates}
+        merged = {key: value for key, value in entry.headers.items() if key.lower() not in replaced}
+        merged.update(updates)
+        lowered = {key.lower(): value for key, value in merged.items()}
+        now = time.time()
+        refreshed = replace(entry, headers=merged, etag=lowered.get('etag'),
+                            last_modified=lowered.get('last-modified'), stored_at=now)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET headers = ?, etag = ?, last_modified = ?, stored_at = ?, accessed_at = ? "
+                "WHERE url = ?",
+                (json.dumps(merged), refreshed.etag, refreshed.last_modified, now, now, entry.url)
+            )
+            self._conn.commit()
+            self._stats['revalidated'] += 1
+        return refreshed
+
+    def _evict(self):
+        """Drop least recently used entries until under the byte cap"""
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._total_bytes = 0
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self._stats['evictions'] += 1
+
+    def record(self, hit: bool):
+        """Count a lookup as served from cache or from the network"""
+        with self._lock:
+            self._stats['hits' if hit else 'misses'] += 1
+
+    def stats(self) -> Dict:
+        """Snapshot of hit-rate and size statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = self._total_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Remove every stored response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+_shared_cache: Optional[HttpCache] = None
+_shared_lock = threading.Lock()
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Return the process-wide cache, or None when caching is disabled"""
+    global _shared_cache
+    if not config.HTTP_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = HttpCache()
+        return _shared_cache
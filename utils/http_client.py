@@ -0,0 +1,246 @@
+from typing import Callable, Dict, Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextvars import copy_context
+from urllib.parse import urlsplit
+import threading
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from utils.deadline import current_deadline
+
+def _accept_encoding() -> str:
+    """Advertise brotli only when urllib3 is able to decode it"""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return "gzip, deflate"
+    return "gzip, deflate, br"
+
+class _TrackingAdapter(HTTPAdapter):
+    """HTTPAdapter that marks each response with whether its connection was reused.
+
+    Read from the connection that served the response, not from pool
+    counts, so requests running at the same time on one host do not blur
+    each other's answer. A connection that reconnected after the server
+    dropped it counts as new.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._sockets = weakref.WeakKeyDictionary()
+        self._sockets_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        conn = getattr(resp, 'connection', None)
+        sock = getattr(conn, 'sock', None)
+        reused = False
+        if sock is not None:
+            with self._sockets_lock:
+                reused = self._sockets.get(conn) is sock
+                self._sockets[conn] = sock
+        response.connection_reused = reused
+        return response
+
+class HttpClient:
+    """Keep-alive HTTP client shared by all agents.
+
+    Wraps a requests Session with per-host connection pools, connect/read
+    timeouts and compressed transfer, and keeps counters for pool reuse,
+    bytes on the wire and request latency. Timeouts are cut short to fit the
+    current run's deadline, if one is set.
+    """
+
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None,
+                 pool_connections: int = None, pool_maxsize: int = None):
+        self.timeout = (
+            connect_timeout or config.HTTP_CONNECT_TIMEOUT,
+            read_timeout or config.HTTP_READ_TIMEOUT
+        )
+        self.session = requests.Session()
+        self.adapter = _TrackingAdapter(
+            pool_connections=pool_connections or config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or config.HTTP_POOL_MAXSIZE
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers.update({
+            "User-Agent": config.HTTP_USER_AGENT,
+            "Accept-Encoding": _accept_encoding()
+        })
+        self._lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero all counters"""
+        with self._lock:
+            self._stats = {
+                'requests': 0,
+                'errors': 0,
+                'pool_hits': 0,
+                'pool_misses': 0,
+                'bytes_received': 0,
+                'bytes_decoded': 0,
+                'bytes_saved': 0,
+                'truncated': 0,
+                'total_latency': 0.0,
+                'hedged': 0,
+                'hedge_wins': 0,
+                'hedges_skipped': 0,
+                'hosts': {}
+            }
+            self._latencies: Dict[str, deque] = {}
+
+    def get(self, url: str, params: Dict = None, headers: Dict = None,
+            timeout=None, **kwargs) -> requests.Response:
+        """Issue a GET through the shared pools and record its cost"""
+        timeout = timeout or self.timeout
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(
+                url, params=params, headers=headers,
+                timeout=timeout, **kwargs
+            )
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._stats['requests'] += 1
+                self._stats['errors'] += 1
+            raise
+        latency = time.perf_counter() - start
+
+        reused = getattr(response, 'connection_reused', False)
+        decoded = len(response.content) if not kwargs.get('stream') else 0
+        try:
+            received = response.raw.tell() or decoded
+        except Exception:
+            received = decoded
+        self._record(url, latency, reused, received, decoded)
+        return response
+
+    def _record(self, url: str, latency: float, reused: bool, received: int, decoded: int):
+        """Add one completed request to the counters"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            stats = self._stats
+            stats['requests'] += 1
+            stats['pool_hits' if reused else 'pool_misses'] += 1
+            stats['bytes_received'] += received
+            stats['bytes_decoded'] += decoded
+            stats['total_latency'] += latency
+
+            host_stats = stats['hosts'].setdefault(host, {'requests': 0, 'pool_hits': 0, 'total_latency': 0.0})
+            host_stats['requests'] += 1
+            host_stats['pool_hits'] += int(reused)
+            host_stats['total_latency'] += latency
+            self._latencies.setdefault(host, deque(maxlen=config.HEDGE_LATENCY_WINDOW)).append(latency)
+
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """The host's recent p95 latency, or None until enough requests have been seen"""
+        with self._lock:
+            recent = sorted(self._latencies.get(urlsplit(url).netloc, ()))
+        if len(recent) < config.HEDGE_MIN_SAMPLES:
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * config.HEDGE_PERCENTILE / 100))]
+
+    def get_hedged(self, url: str, hedge_permit: Callable[[], Optional[Callable[[], None]]] = None,
+                   **kwargs) -> requests.Response:
+        """GET that sends a duplicate request once the first outlasts the host's p95 latency.
+
+        Whichever response arrives first is returned and the other is closed
+        when it lands; if one attempt fails the other is still awaited. The
+        wait is timed from when the first request starts running, not from
+        when it was queued. hedge_permit, if given, is asked for room to send
+        the duplicate (a scheduler slot and token for the domain) and returns
+        a release callback, or None to skip the hedge.
+        """
+        delay = self.hedge_delay(url)
+        deadline = current_deadline()
+        if delay is None or (deadline is not None and deadline.remaining() <= delay):
+            return self.get(url, **kwargs)
+
+        with self._lock:
+            if self._hedge_pool is None:
+                # Every fetch thread may have a primary and a hedge running at once
+                workers = config.HEDGE_WORKERS or 2 * (config.RESEARCH_MAX_WORKERS + config.PREFETCH_WORKERS)
+                self._hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        started = threading.Event()
+
+        def send_primary():
+            started.set()
+            return self.get(url, **kwargs)
+
+        primary = self._hedge_pool.submit(copy_context().run, send_primary)
+        started.wait(deadline.remaining() if deadline is not None else None)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+
+        release = hedge_permit() if hedge_permit is not None else (lambda: None)
+        if release is None:
+            with self._lock:
+                self._stats['hedges_skipped'] += 1
+            return primary.result()
+        hedge = self._hedge_pool.submit(copy_context().run, self.get, url, **kwargs)
+        hedge.add_done_callback(lambda future: release())
+        with self._lock:
+            self._stats['hedged'] += 1
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winners = [future for future in done if future.exception() is None]
+            if winners:
+                for future in set(done) - {winners[0]} | pending:
+                    future.add_done_callback(_close_response)
+                if winners[0] is hedge:
+                    with self._lock:
+                        self._stats['hedge_wins'] += 1
+                return winners[0].result()
+        return primary.result()
+
+    def record_body(self, received: int, decoded: int, saved: int = 0, truncated: bool = False):
+        """Add the body of a streamed response, counted once it has been read or abandoned"""
+        with self._lock:
+            self._stats['bytes_received'] += received
+            self._stats['bytes_decoded'] += decoded
+            self._stats['bytes_saved'] += saved
+            self._stats['truncated'] += int(truncated)
+
+    def stats(self) -> Dict:
+        """Snapshot of the client counters"""
+        with self._lock:
+            snapshot = {**self._stats, 'hosts': {h: dict(s) for h, s in self._stats['hosts'].items()}}
+        completed = snapshot['pool_hits'] + snapshot['pool_misses']
+        snapshot['pool_hit_rate'] = snapshot['pool_hits'] / completed if completed else 0.0
+        snapshot['average_latency'] = snapshot['total_latency'] / completed if completed else 0.0
+        return snapshot
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+def _close_response(future):
+    """Release the connection of a hedged attempt that lost the race"""
+    if future.exception() is None:
+        future.result().close()
+
+_shared_client: Optional[HttpClient] = None
+_shared_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide client, creating it on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
@@ -0,0 +1,157 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import hashlib
+import math
+import re
+import threading
+import config
+
+# NLTK's English stopword list, inlined so keyword extraction needs no corpus download
+STOP_WORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at be because been
+before being below between both but by can couldn couldn't d did didn didn't do does doesn
+doesn't doing don don't down during each few for from further had hadn hadn't has hasn hasn't
+have haven haven't having he her here hers herself him himself his how i if in into is isn
+isn't it it's its itself just ll m ma me mightn mightn't more most mustn mustn't my myself
+needn needn't no nor not now o of off on once only or other our ours ourselves out over own re
+s same shan shan't she she's should should've shouldn shouldn't so some such t than that
+that'll the their theirs them themselves then there these they this those through to too under
+until up very ve was wasn wasn't we were weren weren't what when where which while who whom why
+will with won won't wouldn wouldn't y you you'd you'll you're you've your yours yourself
+yourselves
+""".split())
+
+# Words common to reviews of anything, never useful as an aspect on their own
+GENERIC_REVIEW_TERMS = frozenset("""
+after also bad back best better bought buy day does even ever every get good got great item
+just like love make month much never new nice one order product purchase really recommend still
+thing time use used using week well work worked would year
+""".split())
+
+# Words (with inner hyphens/apostrophes) and numbers; any other non-space character is a phrase break
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*|[^\sa-z0-9]")
+WORD_RE = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word, number and punctuation tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+def normalize_term(word: str) -> str:
+    """Fold simple English plurals so "batteries" and "battery" index together"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+def index_terms(text: str, min_length: int = 3) -> List[str]:
+    """Distinct normalized terms of a review, in order of first appearance"""
+    terms = {}
+    for token in tokenize(text):
+        if len(token) >= min_length and token not in STOP_WORDS and WORD_RE.fullmatch(token):
+            terms.setdefault(normalize_term(token), None)
+    return list(terms)
+
+class KeywordExtractor:
+    """Ranks description keywords by TF-IDF against the descriptions it has seen.
+
+    Terms are unigrams (longer than three letters, not stopwords) and
+    bigrams of adjacent non-stopwords of three letters or more that don't
+    span punctuation or numbers. Document frequencies grow as new descriptions arrive;
+    repeats of an already counted description are not counted again. Once
+    max_documents distinct descriptions are counted the frequencies stop
+    growing, and later descriptions are only ranked against them.
+    """
+
+    def __init__(self, stop_words: Iterable[str] = STOP_WORDS, min_word_length: int = 4,
+                 min_bigram_word_length: int = 3, max_documents: int = None):
+        self.stop_words = frozenset(stop_words)
+        self.min_word_length = min_word_length
+        self.min_bigram_word_length = min_bigram_word_length
+        self.max_documents = max_documents if max_documents is not None else config.KEYWORD_MAX_DOCUMENTS
+        self.doc_freq: Counter = Counter()
+        self.documents = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def terms(self, text: str) -> Dict[str, Tuple[int, int]]:
+        """term -> (count, first position) for the unigrams and bigrams of a text"""
+        found: Dict[str, Tuple[int, int]] = {}
+        previous = None
+        position = 0
+        for token in tokenize(text):
+            if (not WORD_RE.fullmatch(token) or token in self.stop_words
+                    or len(token) < self.min_bigram_word_length):
+                previous = None
+                continue
+            if len(token) >= self.min_word_length:
+                count, first = found.get(token, (0, position))
+                found[token] = (count + 1, first)
+                position += 1
+            if previous is not None:
+                bigram = f"{previous} {token}"
+                count, first = found.get(bigram, (0, position))
+                found[bigram] = (count + 1, first)
+                position += 1
+            previous = token
+        return found
+
+    def add_document(self, text: str, terms: Iterable[str] = None):
+        """Count a description's terms into the document frequencies, once per distinct text"""
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        terms = set(self.terms(text) if terms is None else terms)
+        with self._lock:
+            if digest in self._seen or self.documents >= self.max_documents:
+                return
+            self._seen.add(digest)
+            self.documents += 1
+            self.doc_freq.update(terms)
+
+    def idf(self, term: str) -> float:
+        """Smoothed inverse document frequency"""
+        return math.log((1 + self.documents) / (1 + self.doc_freq.get(term, 0))) + 1
+
+    def extract(self, text: str, top_k: int = 10, update: bool = True) -> List[str]:
+        """Top-k terms by TF-IDF; ties go to bigrams, then to the earlier term.
+
+        A unigram already covered by a higher-ranked bigram is skipped, so
+        "noise cancelling" is not followed by "cancelling".
+        """
+        terms = self.terms(text)
+        if update:
+            self.add_document(text, terms)
+        ranked = sorted(terms.items(), key=lambda item: (
+            -round(item[1][0] * self.idf(item[0]), 9), -item[0].count(" "), item[1][1]))
+
+        keywords = []
+        covered = set()
+        for term, _ in ranked:
+            if term in covered:
+                continue
+            keywords.append(term)
+            covered.update(term.split())
+            if len(keywords) == top_k:
+                break
+        return keywords
+
+_current_corpus: ContextVar[Optional[KeywordExtractor]] = ContextVar("keyword_corpus", default=None)
+
+def current_keyword_corpus() -> Optional[KeywordExtractor]:
+    """The keyword extractor of the run active in this context, if any"""
+    return _current_corpus.get()
+
+@contextmanager
+def keyword_corpus(**kwargs):
+    """Rank description keywords inside this block against this block's descriptions only.
+
+    Like deadlines, the corpus lives in a context variable, so threads
+    started with contextvars.copy_context see it too.
+    """
+    corpus = KeywordExtractor(**kwargs)
+    token = _current_corpus.set(corpus)
+    try:
+        yield corpus
+    finally:
+        _current_corpus.reset(token)
@@ -0,0 +1,194 @@
+"""Background refresh of the most searched queries, so first searches are served warm.
+
+Runs inside the Streamlit process when PREFETCH_ENABLED=1, or as a sidecar
+sharing the same data directory:
+
+    python -m utils.prefetch            # refresh forever
+    python -m utils.prefetch --once     # one cycle, e.g. from cron
+"""
+from typing import Dict, List, Optional
+from collections import deque
+import argparse
+import os
+import sys
+import threading
+import time
+import config
+from utils.deadline import deadline_scope
+from utils.search_cache import get_search_cache
+from utils.storage import ResearchStore, get_research_store
+from utils.telemetry import tracer
+
+class Prefetcher:
+    """Keeps the top-K popular queries' stored results fresh.
+
+    Each cycle refreshes, most popular first, the queries whose results are
+    older than max_age, running them through the same search agent and
+    pipeline as the app. Background work is capped three ways: search calls
+    stop while the day's quota is down to quota_reserve, refreshing takes at
+    most busy_share of wall time (the worker sleeps in between), and no more
+    than max_bytes_per_hour of pages are downloaded.
+    """
+
+    def __init__(self, store: ResearchStore = None, search_agent=None, pipeline=None,
+                 top_k: int = None, interval: float = None, max_age: float = None,
+                 quota_reserve: int = None, busy_share: float = None, max_bytes_per_hour: int = None):
+        self.store = store or get_research_store()
+        self._search_agent = search_agent
+        self._pipeline = pipeline
+        self.top_k = top_k or config.PREFETCH_TOP_K
+        self.interval = config.PREFETCH_INTERVAL if interval is None else interval
+        self.max_age = config.PREFETCH_MAX_AGE if max_age is None else max_age
+        self.quota_reserve = config.PREFETCH_QUOTA_RESERVE if quota_reserve is None else quota_reserve
+        self.busy_share = busy_share or config.PREFETCH_BUSY_SHARE
+        self.max_bytes_per_hour = max_bytes_per_hour or config.PREFETCH_MAX_BYTES_PER_HOUR
+        self._downloads = deque()  # (time, bytes) of refreshes within the last hour
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._status = {'cycles': 0, 'refreshed': 0, 'failed': 0, 'last_cycle': None,
+                        'last_query': None, 'paused': None}
+
+    @property
+    def search_agent(self):
+        if self._search_agent is None:
+            from agents.web_search import WebSearchAgent
+            self._search_agent = WebSearchAgent()
+        return self._search_agent
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            from agents.feature_extraction import FeatureExtractionAgent
+            from utils.sentiment_service import review_agent
+            from pipeline import ResearchPipeline, PipelineConfig
+            # Few fetch threads and no scoring pool of its own keep the refresh off the app's back
+            self._pipeline = ResearchPipeline(FeatureExtractionAgent(), review_agent(workers=1),
+                                              PipelineConfig(max_workers=config.PREFETCH_WORKERS))
+        return self._pipeline
+
+    def due_queries(self) -> List[Dict]:
+        """Popular queries whose stored results are missing or older than max_age"""
+        return [item for item in self.store.popular_queries(self.top_k)
+                if item['age'] is None or item['age'] > self.max_age]
+
+    def bytes_last_hour(self) -> int:
+        cutoff = time.time() - 3600
+        with self._lock:
+            while self._downloads and self._downloads[0][0] < cutoff:
+                self._downloads.popleft()
+            return sum(size for _, size in self._downloads)
+
+    def _pause_reason(self) -> Optional[str]:
+        """Why background work has to wait, or None if it may go on"""
+        cache = get_search_cache()
+        if cache is not None and cache.quota_remaining() <= self.quota_reserve:
+            return f"search quota down to the {self.quota_reserve} calls reserved for users"
+        if self.bytes_last_hour() >= self.max_bytes_per_hour:
+            return "hourly download budget spent"
+        return None
+
+    def refresh(self, query: str) -> int:
+        """Research one query and store the results; returns the number of products stored.
+
+        A refresh only replaces the stored results when it is complete: every
+        product researched in full and at least as many as are stored now.
+        Otherwise the older, complete set stays in place.
+        """
+        with tracer.run(f"prefetch: {query}") as run, deadline_scope(config.PREFETCH_DEADLINE_SECONDS):
+            links = self.search_agent.search_products(query, num_results=config.SEARCH_NUM_RESULTS)
+            products = self.pipeline.run(links)
+        downloaded = run.totals().get('fetch', {}).get('bytes', 0)
+        with self._lock:
+            self._downloads.append((time.time(), downloaded))
+        incomplete = sum(product.get('status', "ok") != "ok" for product in products)
+        stored = self.store.count_products(query)
+        if not products or incomplete or len(products) < stored:
+            print(f"Keeping stored results for '{query}': refresh got {len(products)} products "
+                  f"({incomplete} incomplete), {stored} stored")
+            return 0
+        self.store.upsert_products(query, products, replace=True, source="prefetch")
+        return len(products)
+
+    def run_cycle(self) -> int:
+        """Refresh due queries until they run out or a budget is reached; returns queries refreshed"""
+        refreshed = 0
+        for item in self.due_queries():
+            if self._stop.is_set():
+                break
+            reason = self._pause_reason()
+            if reason:
+                self._set_status(paused=reason)
+                break
+            started = time.perf_counter()
+            try:
+                stored = self.refresh(item['query'])
+                self._set_status(last_query=item['query'], paused=None)
+                self._count('refreshed' if stored else 'failed')
+                refreshed += bool(stored)
+            except Exception as e:
+                print(f"Error prefetching '{item['query']}': {e}")
+                self._count('failed')
+            # Stay idle long enough that refreshing takes at most busy_share of the time
+            busy = time.perf_counter() - started
+            self._stop.wait(busy * (1 / self.busy_share - 1))
+        self._set_status(last_cycle=time.time())
+        self._count('cycles')
+        return refreshed
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_cycle()
+            self._stop.wait(self.interval)
+
+    def start(self) -> "Prefetcher":
+        """Run cycles on a background daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._status[name] += 1
+
+    def _set_status(self, **values):
+        with self._lock:
+            self._status.update(values)
+
+    def status(self) -> Dict:
+        """Counters, the last cycle time and why work is paused, if it is"""
+        with self._lock:
+            status = dict(self._status)
+        status['bytes_last_hour'] = self.bytes_last_hour()
+        return status
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="run a single refresh cycle and exit")
+    parser.add_argument("--top-k", type=int, default=config.PREFETCH_TOP_K)
+    parser.add_argument("--interval", type=float, default=config.PREFETCH_INTERVAL,
+                        help="seconds between refresh cycles")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.getenv("GOOGLE_API") or not os.getenv("SEARCH_ENGINE_ID"):
+        print("Missing GOOGLE_API or SEARCH_ENGINE_ID; set them in the environment or .env")
+        return 2
+
+    prefetcher = Prefetcher(top_k=args.top_k, interval=args.interval)
+    if args.once:
+        print(f"Refreshed {prefetcher.run_cycle()} queries")
+        return 0
+    try:
+        prefetcher.run_forever()
+    except KeyboardInterrupt:
+        prefetcher.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
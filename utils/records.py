@@ -0,0 +1,240 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import Mapping
+import sys
+import threading
+import weakref
+import numpy as np
+
+# Strings up to this length are interned: titles, spec values, feature terms, themes, URLs
+INTERN_MAX_LENGTH = 256
+
+# Per-review score columns and the analysis fields they come from
+SCORE_COLUMNS = {
+    'vader': ('compound', 'positive', 'negative', 'neutral'),
+    'textblob': ('polarity', 'subjectivity'),
+}
+
+def intern(value: str) -> str:
+    return sys.intern(value) if len(value) <= INTERN_MAX_LENGTH else value
+
+_shapes: Dict[Tuple[str, ...], tuple] = {}
+_shapes_lock = threading.Lock()
+
+def _shape(keys: Tuple[str, ...]) -> tuple:
+    """The shared (keys, key -> position) pair for one set of keys"""
+    shape = _shapes.get(keys)
+    if shape is None:
+        with _shapes_lock:
+            shape = _shapes.setdefault(keys, (keys, {key: i for i, key in enumerate(keys)}))
+    return shape
+
+class Record(Mapping):
+    """Immutable, slotted stand-in for a JSON-like dict.
+
+    Values live in a tuple; the key tuple and its key -> position index are
+    shared by every record with the same keys, so a record costs two
+    pointers plus its values instead of a dict's hash table. Reads work as
+    on a dict (record['title'], .get, in, ** unpacking).
+    """
+    __slots__ = ('_shape', '_values')
+
+    def __init__(self, items: Iterable[Tuple[str, Any]]):
+        items = tuple(items)
+        self._shape = _shape(tuple(intern(key) for key, _ in items))
+        self._values = tuple(value for _, value in items)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._shape[1][key]]
+
+    def __contains__(self, key) -> bool:
+        return key in self._shape[1]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shape[0])
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"Record({dict(self)!r})"
+
+    def __reduce__(self):
+        return Record, (tuple(zip(self._shape[0], self._values)),)
+
+class ReviewScores:
+    """Per-review sentiment scores held as float32 columns.
+
+    The form analyze_reviews' list of per-review dicts takes once frozen
+    into a shared result set; the cleaned texts are dropped. Indexing still
+    yields the old dict shape, built on demand, so code reading
+    review['vader']['compound'] keeps working. analyze_reviews itself still
+    returns the full-precision dicts.
+    """
+    __slots__ = ('scorers', 'columns')
+
+    def __init__(self, scorers: Tuple[str, ...], columns: Dict[str, np.ndarray]):
+        self.scorers = scorers
+        self.columns = columns
+
+    @classmethod
+    def from_results(cls, results: List[Dict]) -> "ReviewScores":
+        scorers = tuple(scorer for scorer in SCORE_COLUMNS if results and scorer in results[0])
+        columns = {
+            field: np.fromiter((result[scorer][field] for result in results), dtype=np.float32, count=len(results))
+            for scorer in scorers for field in SCORE_COLUMNS[scorer]
+        }
+        return cls(scorers, columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def _row(self, i: int) -> Dict:
+        # float32 keeps about 7 significant digits; rounding drops the conversion noise
+        return {scorer: {field: round(float(self.columns[field][i]), 6) for field in SCORE_COLUMNS[scorer]}
+                for scorer in self.scorers}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self._row(i) for i in range(len(self)))
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+def freeze(value: Any) -> Any:
+    """Compact, immutable copy of JSON-like data: dicts become Records,
+    lists become tuples, short strings are interned and per-review analyses
+    become ReviewScores columns."""
+    if isinstance(value, (Record, ReviewScores)):
+        return value
+    if isinstance(value, Mapping):
+        return Record((key, freeze_field(key, item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, str):
+        return intern(value)
+    return value
+
+def freeze_field(key: str, value: Any) -> Any:
+    if key == 'reviews' and isinstance(value, list) and value and isinstance(value[0], dict):
+        return ReviewScores.from_results(value)
+    return freeze(value)
+
+def thaw(value: Any) -> Any:
+    """Plain dict/list copy of frozen data"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, ReviewScores):
+        return value.to_list()
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+class SharedResultSet(Mapping):
+    """One page of a query's stored results, frozen and shared by every session showing it.
+
+    Reads like the dict load_data used to return ("query", "products",
+    "total_products", "page"). Sessions keep it alive by holding it in their
+    state; once none do, it is dropped from the registry. Derived data such
+    as the ranking matrix is computed once per set with derived().
+    """
+    __slots__ = ('_data', '_derived', '_lock', '__weakref__')
+
+    def __init__(self, query: Optional[str], products: Iterable[Dict], total_products: int, page: int):
+        self._data = Record((('query', query), ('products', tuple(freeze(product) for product in products)),
+                             ('total_products', total_products), ('page', page)))
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def derived(self, name: str, build: Callable[["SharedResultSet"], Any]) -> Any:
+        """build(self), computed on first request and shared from then on"""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+class ResultSetRegistry:
+    """Hands out one SharedResultSet per (query, page, version), held weakly"""
+
+    def __init__(self):
+        self._sets = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.stats = {'built': 0, 'shared': 0}
+
+    def get(self, key: tuple, build: Callable[[], SharedResultSet]) -> SharedResultSet:
+        with self._lock:
+            result_set = self._sets.get(key)
+            if result_set is not None:
+                self.stats['shared'] += 1
+                return result_set
+        # Built outside the lock; if two sessions race, the first one stored wins
+        result_set = build()
+        with self._lock:
+            existing = self._sets.get(key)
+            if existing is not None:
+                self.stats['shared'] += 1
+                return existing
+            self._sets[key] = result_set
+            self.stats['built'] += 1
+            return result_set
+
+    def live(self) -> int:
+        """Result sets still referenced by at least one session"""
+        return len(self._sets)
+
+result_sets = ResultSetRegistry()
+
+def deep_size(value: Any, seen: set = None) -> int:
+    """Bytes held by an object graph, counting shared objects (interned strings, key tuples) once"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, Record):
+        return size + deep_size(value._shape, seen) + deep_size(value._values, seen)
+    if isinstance(value, ReviewScores):
+        return size + deep_size(value.scorers, seen) + deep_size(value.columns, seen)
+    if isinstance(value, dict):
+        return size + sum(deep_size(key, seen) + deep_size(item, seen) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(item, seen) for item in value)
+    return size
+
+def memory_report(products: Iterable[Dict]) -> Dict:
+    """Bytes per product and per analyzed review as plain dicts (before) and as records (after)"""
+    before = [thaw(product) for product in products]
+    after = [freeze(product) for product in before]
+    reviews = sum(len((product.get('review_summary') or {}).get('reviews') or ()) for product in before)
+
+    def review_bytes(items: List) -> int:
+        seen = set()
+        return sum(deep_size((product.get('review_summary') or {}).get('reviews'), seen) for product in items)
+
+    # Key tuples and their indexes are shared by every record in the process, so they are not counted
+    shapes = {id(shape) for shape in list(_shapes.values())}
+    report = {'products': len(before), 'reviews': reviews,
+              'before_bytes': deep_size(before), 'after_bytes': deep_size(after, shapes)}
+    if before:
+        report['before_per_product'] = report['before_bytes'] / len(before)
+        report['after_per_product'] = report['after_bytes'] / len(after)
+    if reviews:
+        report['before_per_review'] = review_bytes(before) / reviews
+        report['after_per_review'] = review_bytes(after) / reviews
+    return report
@@ -0,0 +1,50 @@
+from typing import Iterable
+import config
+
+# NLTK resource name -> path looked up by nltk.data.find
+NLTK_RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+}
+
+_verified = set()
+
+def ensure_nltk_resources(names: Iterable[str], download: bool = None):
+    """Check that NLTK data is installed, without touching the network by default.
+
+    Raises LookupError naming the missing resources unless download is
+    enabled (argument or NLTK_AUTO_DOWNLOAD), in which case they are
+    fetched once.
+    """
+    import nltk
+
+    download = config.NLTK_AUTO_DOWNLOAD if download is None else download
+    missing = []
+    for name in names:
+        if name in _verified:
+            continue
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+            _verified.add(name)
+        except LookupError:
+            missing.append(name)
+
+    if missing and download:
+        for name in missing:
+            nltk.download(name, quiet=True)
+        return ensure_nltk_resources(missing, download=False)
+
+    if missing:
+        raise LookupError(
+            f"Missing NLTK data: {', '.join(missing)}. "
+            f"Install it with `python -m utils.resources --download` "
+            f"or set NLTK_AUTO_DOWNLOAD=1."
+        )
+
+if __name__ == "__main__":
+    import sys
+    try:
+        ensure_nltk_resources(NLTK_RESOURCES, download='--download' in sys.argv)
+        print("All NLTK resources are installed")
+    except LookupError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,319 @@
+from typing import Callable, Dict, List, Optional
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import threading
+import time
+import requests
+import config
+from utils.deadline import DeadlineExceeded, current_deadline
+from utils.http_client import HttpClient, get_http_client
+from utils.telemetry import annotate, tracer
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+class DisallowedByRobots(requests.exceptions.RequestException):
+    """The site's robots.txt does not allow fetching this URL"""
+
+def domain_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def interleave_by_domain(items: List, url: Callable = lambda item: item) -> List:
+    """Reorder items round-robin across domains, keeping each domain's own order.
+
+    Submitting work in this order keeps every domain busy at once instead of
+    queuing a pool's worth of requests behind one retailer.
+    """
+    queues: Dict[str, deque] = defaultdict(deque)
+    for item in items:
+        queues[domain_of(url(item))].append(item)
+    ordered = []
+    while queues:
+        for domain in list(queues):
+            ordered.append(queues[domain].popleft())
+            if not queues[domain]:
+                del queues[domain]
+    return ordered
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given as seconds or as an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once and kept for `ttl` seconds.
+
+    Missing or forbidden robots.txt files allow everything, as do sites that
+    cannot be reached; the latter are retried sooner.
+    """
+
+    def __init__(self, client: HttpClient = None, ttl: int = None, user_agent: str = None):
+        self.client = client or get_http_client()
+        self.ttl = config.ROBOTS_TTL if ttl is None else ttl
+        self.user_agent = user_agent or config.HTTP_USER_AGENT
+        self._rules: Dict[str, tuple] = {}
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def rules(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            origin_lock = self._locks[origin]
+        # One fetch per origin; concurrent callers wait for it
+        with origin_lock:
+            cached = self._rules.get(origin)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+            rules, ttl = self._fetch(origin)
+            self._rules[origin] = (rules, time.monotonic() + ttl)
+            return rules
+
+    def _fetch(self, origin: str) -> tuple:
+        rules = RobotFileParser(origin + "/robots.txt")
+        try:
+            response = self.client.get(origin + "/robots.txt", timeout=config.HTTP_CONNECT_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch robots.txt for {origin}: {e}")
+            rules.allow_all = True
+            return rules, min(self.ttl, 300)
+        if response.status_code >= 400:
+            rules.allow_all = True
+        else:
+            rules.parse(response.text.splitlines())
+        return rules, self.ttl
+
+    def allowed(self, url: str) -> bool:
+        return self.rules(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        rules = self.rules(url)
+        delay = rules.crawl_delay(self.user_agent)
+        rate = rules.request_rate(self.user_agent)
+        if rate is not None and rate.requests:
+            delay = max(delay or 0, rate.seconds / rate.requests)
+        return float(delay) if delay else None
+
+class _Domain:
+    """Scheduling state for one domain"""
+
+    def __init__(self, name: str, rate: float, burst: float, concurrency: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = concurrency
+        self.in_flight = 0
+        self.not_before = 0.0
+        self.backoffs = 0
+        self.baseline: Optional[float] = None
+        self.stats = {'requests': 0, 'throttled': 0, 'retries': 0, 'blocked': 0, 'hedges': 0, 'wait_seconds': 0.0}
+
+class FetchScheduler:
+    """Per-domain politeness for page fetches.
+
+    Each domain gets a token bucket (slowed to its robots.txt crawl-delay)
+    and a concurrency limit adjusted AIMD-style: it grows by one request per
+    window of successful responses and shrinks when latency climbs well
+    above the domain's baseline, halving on 429/503. Throttled requests wait
+    out Retry-After (or an exponential backoff) and are retried. Requests to
+    different domains never wait on each other.
+    """
+
+    def __init__(self, client: HttpClient = None, robots: RobotsCache = None, rate: float = None,
+                 burst: float = None, initial_concurrency: float = None, max_concurrency: float = None,
+                 max_retries: int = None, max_retry_after: float = None):
+        self.client = client or get_http_client()
+        self.robots = robots if robots is not None else (RobotsCache(self.client) if config.ROBOTS_ENABLED else None)
+        self.rate = rate or config.SCHEDULER_DOMAIN_RATE
+        self.burst = burst or config.SCHEDULER_DOMAIN_BURST
+        self.initial_concurrency = initial_concurrency or config.SCHEDULER_INITIAL_CONCURRENCY
+        self.max_concurrency = max_concurrency or config.SCHEDULER_MAX_CONCURRENCY
+        self.max_retries = config.SCHEDULER_MAX_RETRIES if max_retries is None else max_retries
+        self.max_retry_after = config.SCHEDULER_MAX_RETRY_AFTER if max_retry_after is None else max_retry_after
+        self._domains: Dict[str, _Domain] = {}
+        self._changed = threading.Condition()
+
+    def _domain(self, url: str) -> _Domain:
+        """State for a URL's domain, created on first use; call with the condition held"""
+        name = domain_of(url)
+        if name not in self._domains:
+            self._domains[name] = _Domain(name, self.rate, self.burst, self.initial_concurrency)
+        return self._domains[name]
+
+    def _crawl_limits(self, url: str, domain: _Domain):
+        """Apply robots.txt to the domain's bucket; raises if the URL is disallowed"""
+        if self.robots is None:
+            return
+        if not self.robots.allowed(url):
+            with self._changed:
+                domain.stats['blocked'] += 1
+            raise DisallowedByRobots(f"robots.txt disallows {url}")
+        delay = self.robots.crawl_delay(url)
+        if delay:
+            with self._changed:
+                domain.bucket.rate = min(domain.bucket.rate, 1 / delay)
+                domain.bucket.burst = 1
+
+    def _acquire(self, domain: _Domain):
+        """Block until the domain has a free slot, a token and no backoff pending.
+
+        Raises DeadlineExceeded if the run's deadline passes while waiting.
+        """
+        waited = time.monotonic()
+        deadline = current_deadline()
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                if deadline is not None and deadline.expired:
+                    domain.stats['wait_seconds'] += now - waited
+                    raise DeadlineExceeded(f"{deadline.seconds:g}s deadline passed waiting for {domain.name}")
+                limit = deadline.remaining() if deadline is not None else float('inf')
+                if domain.in_flight >= max(1, int(domain.limit)):
+                    self._changed.wait(None if deadline is None else limit)
+                elif now < domain.not_before:
+                    self._changed.wait(min(domain.not_before - now, limit))
+                else:
+                    wait = domain.bucket.take(now)
+                    if not wait:
+                        break
+                    self._changed.wait(min(wait, limit))
+            domain.in_flight += 1
+            domain.stats['requests'] += 1
+            domain.stats['wait_seconds'] += time.monotonic() - waited
+
+    def try_acquire(self, url: str) -> Optional[Callable[[], None]]:
+        """Take a slot and token for url's domain only if both are free right now.
+
+        Used for hedged duplicates, which must not exceed the domain's limits
+        but are not worth waiting for. Returns the slot's release callback.
+        """
+        with self._changed:
+            domain = self._domain(url)
+            now = time.monotonic()
+            if (domain.in_flight >= max(1, int(domain.limit)) or now < domain.not_before
+                    or domain.bucket.take(now)):
+                return None
+            domain.in_flight += 1
+            domain.stats['requests'] += 1
+            domain.stats['hedges'] += 1
+        return lambda: self._release(domain)
+
+    def _release(self, domain: _Domain):
+        with self._changed:
+            domain.in_flight -= 1
+            self._changed.notify_all()
+
+    def _observe(self, domain: _Domain, response: Optional[requests.Response], latency: float) -> Optional[float]:
+        """Adjust the domain's limit after a response; returns a backoff delay if it was throttled"""
+        with self._changed:
+            if response is None or response.status_code in THROTTLE_STATUSES:
+                domain.limit = max(1.0, domain.limit / 2)
+                domain.backoffs += 1
+                delay = retry_after_seconds(response.headers.get('Retry-After')) if response is not None else None
+                if delay is None:
+                    delay = min(self.max_retry_after, 2 ** (domain.backoffs - 1))
+                domain.not_before = max(domain.not_before, time.monotonic() + delay)
+                domain.stats['throttled'] += int(response is not None)
+                return delay
+
+            domain.backoffs = 0
+            domain.baseline = latency if domain.baseline is None else min(
+                latency, 0.9 * domain.baseline + 0.1 * latency)
+            if latency > 2 * domain.baseline and latency > config.SCHEDULER_SLOW_SECONDS:
+                domain.limit = max(1.0, domain.limit * 0.75)
+            else:
+                domain.limit = min(self.max_concurrency, domain.limit + 1 / domain.limit)
+            self._changed.notify_all()
+            return None
+
+    @contextmanager
+    def request(self, url: str, send: Callable[[], requests.Response]):
+        """Run send() for url under the domain's limits and yield its response.
+
+        The domain slot is held until the block exits, so reading a streamed
+        body counts against the domain's concurrency.
+        """
+        with self._changed:
+            domain = self._domain(url)
+        self._crawl_limits(url, domain)
+
+        for attempt in range(self.max_retries + 1):
+            with tracer.span("queue", domain=domain_of(url)):
+                self._acquire(domain)
+            start = time.perf_counter()
+            try:
+                response = send()
+            except requests.exceptions.ConnectionError:
+                self._observe(domain, None, time.perf_counter() - start)
+                self._release(domain)
+                raise
+            except BaseException:
+                self._release(domain)
+                raise
+
+            delay = self._observe(domain, response, time.perf_counter() - start)
+            deadline = current_deadline()
+            if (delay is None or attempt == self.max_retries or delay > self.max_retry_after
+                    or (deadline is not None and delay >= deadline.remaining())):
+                break
+            # Throttled: give the slot back and wait out the backoff before retrying
+            annotate(retries=1)
+            with self._changed:
+                domain.stats['retries'] += 1
+            response.close()
+            self._release(domain)
+
+        try:
+            yield response
+        finally:
+            self._release(domain)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-domain concurrency limit and counters"""
+        with self._changed:
+            return {
+                name: {'limit': round(domain.limit, 2), 'in_flight': domain.in_flight,
+                       'rate': round(domain.bucket.rate, 3), **domain.stats}
+                for name, domain in self._domains.items()
+            }
+
+_shared_scheduler: Optional[FetchScheduler] = None
+_shared_lock = threading.Lock()
+
+def get_fetch_scheduler() -> Optional[FetchScheduler]:
+    """Return the process-wide scheduler, or None when politeness scheduling is disabled"""
+    global _shared_scheduler
+    if not config.SCHEDULER_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = FetchScheduler()
+        return _shared_scheduler
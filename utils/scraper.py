@@ -0,0 +1,196 @@
+from typing import Optional
+import codecs
+import requests
+import config
+from utils.deadline import current_deadline
+from utils.http_client import HttpClient, get_http_client
+from utils.http_cache import CacheEntry, HttpCache, get_http_cache
+from utils.scheduler import FetchScheduler, get_fetch_scheduler
+from utils.spec_extraction import SpecParser, feed_until_complete
+from utils.telemetry import annotate, traced
+
+class FetchedDocument:
+    """A product page fetched once and shared by every extractor.
+
+    Holds the raw response bytes; the decoded text and the BeautifulSoup
+    tree are built on first access and reused afterwards. A truncated
+    document holds only the start of a body whose download was cut short.
+    Bodies with no declared charset are decoded as UTF-8, however they
+    were read.
+    """
+
+    def __init__(self, url: str, content: bytes, encoding: Optional[str] = None,
+                 status_code: int = 200, headers: Optional[dict] = None, truncated: bool = False):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.truncated = truncated
+        self._text = None
+        self._soup = None
+
+    @classmethod
+    def from_response(cls, response: requests.Response) -> "FetchedDocument":
+        """Build a document from a completed requests response"""
+        return cls(
+            url=response.url,
+            content=response.content,
+            encoding=declared_encoding(response),
+            status_code=response.status_code,
+            headers=dict(response.headers)
+        )
+
+    @classmethod
+    def from_cache(cls, entry: CacheEntry) -> "FetchedDocument":
+        """Build a document from a cached response"""
+        return cls(
+            url=entry.url,
+            content=entry.content,
+            encoding=entry.encoding,
+            status_code=entry.status_code,
+            headers=entry.headers,
+            truncated=entry.partial_for is not None
+        )
+
+    @property
+    def text(self) -> str:
+        """Decoded page text, decoded once on first access"""
+        if self._text is None:
+            self._text = self.content.decode(self.encoding or 'utf-8', errors='replace')
+        return self._text
+
+    @property
+    def soup(self) -> "BeautifulSoup":
+        """Parse tree, built once on first access"""
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.text, 'html.parser')
+        return self._soup
+
+def declared_encoding(response: requests.Response) -> str:
+    """The charset the response declares, or UTF-8 if it names none"""
+    # Without a declared charset, requests would guess ISO-8859-1; pages are overwhelmingly UTF-8
+    declared = 'charset' in response.headers.get('Content-Type', '').lower()
+    return response.encoding if declared and response.encoding else 'utf-8'
+
+def _needs(parser: SpecParser) -> str:
+    """What a parser must find to be complete; a page prefix one parser finished on serves any with the same needs"""
+    return ",".join(parser.fields) + ("+description" if parser.want_description else "")
+
+def stream_document(response: requests.Response, parser: SpecParser, client: HttpClient,
+                    byte_budget: int = None, chunk_bytes: int = None) -> FetchedDocument:
+    """Read a streamed response into the parser, stopping early when it is complete.
+
+    Reading also stops once byte_budget decoded bytes have arrived or the
+    run's deadline passes, leaving the parser with what it has seen. An
+    abandoned body's connection is closed rather than drained; the bytes
+    left unread are estimated from Content-Length when the server sent one.
+    """
+    byte_budget = config.FETCH_BYTE_BUDGET if byte_budget is None else byte_budget
+    encoding = declared_encoding(response)
+    decoder = codecs.getincrementaldecoder(codecs.lookup(encoding).name)(errors='replace')
+
+    declared_length = response.headers.get('Content-Length', '')
+    declared_length = int(declared_length) if declared_length.isdigit() else None
+    deadline = current_deadline()
+    chunks = []
+    received = 0
+    stopped = False
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_bytes or config.FETCH_CHUNK_BYTES):
+            chunks.append(chunk)
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if (parser.complete or (byte_budget and received >= byte_budget)
+                    or (deadline is not None and deadline.expired)):
+                stopped = True
+                break
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+        wire = response.raw.tell() or received
+    finally:
+        response.close()
+
+    content = b"".join(chunks)
+    # Stopping on the last chunk still leaves a whole body, which is safe to cache
+    truncated = stopped and (declared_length is None or wire < declared_length)
+    saved = max(0, declared_length - wire) if truncated and declared_length is not None else 0
+    client.record_body(wire, len(content), saved, truncated)
+    annotate(bytes=wire, bytes_saved=saved)
+    return FetchedDocument(
+        url=response.url,
+        content=content,
+        encoding=encoding,
+        status_code=response.status_code,
+        headers=dict(response.headers),
+        truncated=truncated
+    )
+
+@traced("fetch")
+def fetch_document(url: str, client: HttpClient = None, cache: HttpCache = None,
+                   parser: SpecParser = None, byte_budget: int = None,
+                   scheduler: FetchScheduler = None) -> FetchedDocument:
+    """Fetch a page and wrap it for shared use by the extractors.
+
+    Fresh cached copies are served without touching the network; stale ones
+    are revalidated with a conditional request. With a parser, the page is
+    fed to it as it arrives and the download ends as soon as the parser has
+    everything it needs. That prefix is cached as a partial entry, served
+    only to parsers with the same needs; bodies cut short by the byte
+    budget or the deadline are not cached. Either way the parser has seen
+    the page when this returns. Network requests go
+    through the per-domain politeness scheduler unless it is disabled.
+    """
+    client = client or get_http_client()
+    cache = cache or get_http_cache()
+    scheduler = scheduler or get_fetch_scheduler()
+    entry = cache.get(url) if cache is not None else None
+    if entry is not None and entry.partial_for is not None and (parser is None or entry.partial_for != _needs(parser)):
+        # A page prefix only stands in for the page for a parser that would finish on it
+        entry = None
+    if entry is not None and cache.is_fresh(entry):
+        cache.record(hit=True)
+        annotate(cache_hits=1)
+        return _parsed(FetchedDocument.from_cache(entry), parser)
+
+    headers = cache.validators(entry) if cache is not None else None
+    if config.HEDGE_ENABLED:
+        # A hedged duplicate needs its own scheduler slot and token, or is not sent
+        permit = (lambda: scheduler.try_acquire(url)) if scheduler is not None else None
+        send = lambda: client.get_hedged(url, hedge_permit=permit, headers=headers, stream=parser is not None)
+    else:
+        send = lambda: client.get(url, headers=headers, stream=parser is not None)
+    if scheduler is None:
+        return _fetched(url, send(), entry, client, cache, parser, byte_budget)
+    with scheduler.request(url, send) as response:
+        return _fetched(url, response, entry, client, cache, parser, byte_budget)
+
+def _fetched(url: str, response: requests.Response, entry: Optional[CacheEntry], client: HttpClient,
+             cache: Optional[HttpCache], parser: Optional[SpecParser], byte_budget: Optional[int]) -> FetchedDocument:
+    """Turn a page response into a document, reusing the cached entry on 304"""
+    if response.status_code == 304 and entry is not None:
+        response.close()
+        entry = cache.refresh(entry, response.headers)
+        cache.record(hit=True)
+        annotate(cache_hits=1)
+        return _parsed(FetchedDocument.from_cache(entry), parser)
+
+    if cache is not None:
+        cache.record(hit=False)
+    if parser is None:
+        document = FetchedDocument.from_response(response)
+        annotate(bytes=len(document.content))
+    else:
+        document = stream_document(response, parser, client, byte_budget)
+    if cache is not None and response.status_code == 200 and (not document.truncated or parser.complete):
+        cache.put(url, document.status_code, document.headers, document.content, document.encoding,
+                  partial_for=_needs(parser) if document.truncated else None)
+    return document
+
+def _parsed(document: FetchedDocument, parser: Optional[SpecParser]) -> FetchedDocument:
+    """Run a parser over a document that did not arrive by streaming"""
+    if parser is not None:
+        feed_until_complete(parser, document.text)
+    return document
@@ -0,0 +1,178 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import json
+import os
+import sqlite3
+import threading
+import time
+import config
+from utils.telemetry import annotate
+
+def normalize_query(query: str) -> str:
+    """Normalize case, whitespace and token order so equivalent queries share a key"""
+    return " ".join(sorted(query.lower().split()))
+
+class _Flight:
+    """An upstream call in progress that identical queries wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results: Optional[List[Dict]] = None
+        self.error: Optional[BaseException] = None
+
+class SearchResultCache:
+    """Persistent cache of search results with a daily quota ledger.
+
+    Results are keyed by normalized query and result count. Concurrent
+    identical queries share a single upstream call, and once the daily
+    budget is spent stale results are served instead of calling out.
+    """
+
+    def __init__(self, path: str = None, ttl: int = None, daily_quota: int = None):
+        self.path = path or config.SEARCH_CACHE_PATH
+        self.ttl = ttl if ttl is not None else config.SEARCH_CACHE_TTL
+        self.daily_quota = daily_quota if daily_quota is not None else config.SEARCH_DAILY_QUOTA
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_results (
+                key TEXT PRIMARY KEY,
+                query TEXT,
+                num_results INTEGER,
+                results TEXT,
+                stored_at REAL
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, calls INTEGER)")
+        self._conn.commit()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stale_served': 0, 'upstream_calls': 0}
+
+    @staticmethod
+    def key(query: str, num_results: int) -> str:
+        return f"{normalize_query(query)}|{num_results}"
+
+    def _lookup(self, key: str) -> Optional[Tuple[List[Dict], float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, stored_at FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _store(self, key: str, query: str, num_results: int, results: List[Dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)",
+                (key, normalize_query(query), num_results, json.dumps(results), time.time())
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def calls_today(self) -> int:
+        """Upstream calls recorded against today's budget"""
+        with self._lock:
+            row = self._conn.execute("SELECT calls FROM quota WHERE day = ?", (self._today(),)).fetchone()
+        return row[0] if row else 0
+
+    def quota_remaining(self) -> int:
+        return max(0, self.daily_quota - self.calls_today())
+
+    def _consume_quota(self) -> bool:
+        """Reserve one call from today's budget; False if it is spent.
+
+        A single conditional upsert, so batch worker processes sharing the
+        ledger cannot all read the same count and overspend it.
+        """
+        if self.daily_quota <= 0:
+            return False
+        with self._lock:
+            reserved = self._conn.execute(
+                "INSERT INTO quota VALUES (?, 1) ON CONFLICT (day) DO UPDATE SET calls = calls + 1 WHERE calls < ?",
+                (self._today(), self.daily_quota)
+            ).rowcount
+            self._conn.commit()
+            if not reserved:
+                return False
+            self._stats['upstream_calls'] += 1
+        return True
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_or_fetch(self, query: str, num_results: int, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        """Return cached results, or call fetch once for all concurrent identical queries"""
+        key = self.key(query, num_results)
+        cached = self._lookup(key)
+        if cached and time.time() - cached[1] < self.ttl:
+            self._count('hits')
+            annotate(cache_hits=1)
+            return cached[0]
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.results
+
+        try:
+            if not self._consume_quota():
+                print("Daily search quota spent; serving cached results")
+                self._count('stale_served')
+                flight.results = cached[0] if cached else []
+            else:
+                try:
+                    flight.results = fetch()
+                    self._store(key, query, num_results, flight.results)
+                except Exception as e:
+                    if not cached:
+                        raise
+                    print(f"Search failed ({e}); serving stale results")
+                    self._count('stale_served')
+                    flight.results = cached[0]
+            return flight.results
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict:
+        """Snapshot of cache and quota statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        stats['quota_remaining'] = self.quota_remaining()
+        return stats
+
+_shared_cache: Optional[SearchResultCache] = None
+_shared_lock = threading.Lock()
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Return the process-wide search cache, or None when it is disabled"""
+    global _shared_cache
+    if not config.SEARCH_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = SearchResultCache()
+        return _shared_cache
@@ -0,0 +1,110 @@
+from typing import Dict, Iterable, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import config
+
+def memo_key(cleaned_text: str, scorer_version: str) -> str:
+    """Content hash of cleaned review text for a given scorer version"""
+    return hashlib.sha1(f"{scorer_version}\x00{cleaned_text}".encode('utf-8')).hexdigest()
+
+class SentimentMemo:
+    """Two-tier memo of sentiment scores.
+
+    An in-memory LRU sits in front of a SQLite table so identical review
+    text is scored once across batches, sessions and re-runs.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, path: str = None, memory_size: int = None):
+        self.path = path or config.SENTIMENT_CACHE_PATH
+        self.memory_size = memory_size or config.SENTIMENT_MEMO_SIZE
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, result TEXT)")
+        self._conn.commit()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def _remember(self, key: str, result: Dict):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """Return the stored scores for whichever keys are known"""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+            self._stats['memory_hits'] += len(found)
+
+            disk_found = 0
+            for i in range(0, len(missing), self._LOOKUP_BATCH):
+                batch = missing[i:i + self._LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM scores WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, result in rows:
+                    found[key] = json.loads(result)
+                    self._remember(key, found[key])
+                disk_found += len(rows)
+            self._stats['disk_hits'] += disk_found
+            self._stats['misses'] += len(missing) - disk_found
+        return found
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, Dict]):
+        """Store freshly computed scores in both tiers"""
+        if not items:
+            return
+        with self._lock:
+            for key, result in items.items():
+                self._remember(key, result)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?)",
+                [(key, json.dumps(result)) for key, result in items.items()]
+            )
+            self._conn.commit()
+
+    def put(self, key: str, result: Dict):
+        self.put_many({key: result})
+
+    def stats(self) -> Dict:
+        """Snapshot of lookup statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+_shared_memo: Optional[SentimentMemo] = None
+_shared_lock = threading.Lock()
+
+def get_sentiment_memo() -> Optional[SentimentMemo]:
+    """Return the process-wide memo, or None when memoization is disabled"""
+    global _shared_memo
+    if not config.SENTIMENT_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_memo is None:
+            _shared_memo = SentimentMemo()
+        return _shared_memo
@@ -0,0 +1,475 @@
+"""One sentiment scoring pool per host, shared by every app, batch and prefetch process.
+
+Run it next to the app and point SENTIMENT_SERVICE_ADDRESS at it:
+
+    python -m utils.sentiment_service --metrics-port 9109    # listens on data/sentiment_service.sock
+    SENTIMENT_SERVICE_ADDRESS=data/sentiment_service.sock streamlit run app.py
+
+Requests are pickled, so every connection has to prove the shared key:
+SENTIMENT_SERVICE_AUTHKEY, or else a random key the service writes to
+SENTIMENT_SERVICE_KEY_FILE (readable by its owner only). Prefer the Unix
+socket; a host:port address is reachable by anyone who can reach the port
+and is only as safe as the key.
+
+Processes then score reviews through SentimentServiceClient, which behaves
+like ReviewAnalysisAgent but sends the texts it has not memoized to the
+service instead of loading VADER and TextBlob itself.
+"""
+from typing import Dict, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+import argparse
+import errno
+import itertools
+import os
+import secrets
+import signal
+import socket
+import stat
+import sys
+import threading
+import time
+import config
+from agents.review_analysis import SCORERS, ReviewAnalysisAgent, _init_worker, _score_chunk
+
+Address = Union[str, Tuple[str, int]]
+
+class ServiceBusy(RuntimeError):
+    """The service's queue is full; retry later or score locally"""
+
+def parse_address(address: str) -> Address:
+    """"host:port" for TCP, anything else is a Unix socket path"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+def service_authkey(create: bool = False) -> bytes:
+    """The key connections must prove: SENTIMENT_SERVICE_AUTHKEY, else the key file.
+
+    With create=True (the service) a missing key file is generated. Raises
+    OSError if there is no key, or if the key file is readable by others.
+    """
+    if config.SENTIMENT_SERVICE_AUTHKEY:
+        return config.SENTIMENT_SERVICE_AUTHKEY.encode("utf-8")
+    path = config.SENTIMENT_SERVICE_KEY_FILE
+    if create and not os.path.exists(path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass  # another service instance wrote it first
+    if os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"{path} is readable by other users; chmod 600 it or set SENTIMENT_SERVICE_AUTHKEY")
+    with open(path) as f:
+        key = f.read().strip()
+    if not key:
+        raise PermissionError(f"{path} is empty")
+    return key.encode("utf-8")
+
+def remove_stale_socket(path: str):
+    """Unlink a socket file left by a service that died without closing it.
+
+    Raises OSError if a service is still answering on it.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)  # nothing is listening
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"a sentiment service is already listening on {path}")
+
+class _Job:
+    __slots__ = ('connection', 'request_id', 'texts', 'scorers', 'enqueued', 'results', 'pending')
+
+    def __init__(self, connection: "_Connection", request_id: int, texts: List[str], scorers: tuple):
+        self.connection = connection
+        self.request_id = request_id
+        self.texts = texts
+        self.scorers = scorers
+        self.enqueued = time.perf_counter()
+        self.results: List[Optional[Dict]] = [None] * len(texts)
+        self.pending = len(texts)
+
+class _Connection:
+    """A client connection; replies come from several threads, so sends are serialized"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            try:
+                self.conn.send(message)
+            except (OSError, EOFError):
+                pass  # the client went away; its results are dropped
+
+class SentimentService:
+    """Scores review texts for many client processes in a single worker pool.
+
+    Requests are queued and gathered into micro-batches of up to batch_size
+    texts, waiting at most batch_wait seconds for a batch to fill. Texts
+    repeated across requests are scored once per batch. At most max_queue
+    texts wait at a time; requests beyond that are turned away as busy so
+    clients back off instead of piling up behind a slow pool.
+    """
+
+    def __init__(self, address: Address = None, workers: int = None, max_queue: int = None,
+                 batch_size: int = None, batch_wait: float = None, authkey: bytes = None):
+        self.address = address or parse_address(config.SENTIMENT_SERVICE_ADDRESS or config.SENTIMENT_SERVICE_SOCKET)
+        self.workers = workers or config.SENTIMENT_WORKERS
+        self.max_queue = max_queue or config.SENTIMENT_SERVICE_MAX_QUEUE
+        self.batch_size = batch_size or config.SENTIMENT_SERVICE_BATCH_SIZE
+        self.batch_wait = config.SENTIMENT_SERVICE_BATCH_WAIT if batch_wait is None else batch_wait
+        self.authkey = authkey
+        self._jobs: deque = deque()
+        self._queued_texts = 0
+        self._changed = threading.Condition()
+        # Chunks handed to the pool but not yet scored; bounds work in flight to what the pool can run
+        self._in_flight = threading.Semaphore(self.workers * 2)
+        self._latencies: deque = deque(maxlen=1000)
+        self._stats = {'connections': 0, 'requests': 0, 'texts': 0, 'batches': 0, 'batched_texts': 0,
+                       'rejected': 0, 'errors': 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._listener: Optional[Listener] = None
+        self._stop = threading.Event()
+
+    def start(self) -> "SentimentService":
+        """Start the worker pool (loading the lexicons now, not on the first request) and the listener"""
+        authkey = self.authkey or service_authkey(create=True)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        for future in [self._pool.submit(_score_chunk, ["warm up"], SCORERS) for _ in range(self.workers)]:
+            future.result()
+        if isinstance(self.address, str):
+            if os.path.dirname(self.address):
+                os.makedirs(os.path.dirname(self.address), exist_ok=True)
+            remove_stale_socket(self.address)
+        self._listener = Listener(self.address, authkey=authkey)
+        self.address = self._listener.address
+        if isinstance(self.address, str):
+            os.chmod(self.address, 0o600)
+        threading.Thread(target=self._accept_loop, name="sentiment-accept", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="sentiment-batcher", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+        self._stop.wait()
+
+    def stop(self):
+        """Stop serving; closing the listener also removes its Unix socket"""
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+        if self._listener is not None:
+            self._listener.close()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._stop.is_set():
+                    return
+                continue  # a client that failed the handshake
+            self._count('connections')
+            threading.Thread(target=self._serve_connection, args=(_Connection(conn),), daemon=True).start()
+
+    def _serve_connection(self, connection: _Connection):
+        while not self._stop.is_set():
+            try:
+                request_id, op, *args = connection.conn.recv()
+            except (OSError, EOFError):
+                connection.conn.close()
+                return
+            if op == 'score':
+                texts, scorers = args
+                if not self.submit(_Job(connection, request_id, list(texts), tuple(scorers))):
+                    connection.send((request_id, 'busy', None))
+            elif op == 'stats':
+                connection.send((request_id, 'ok', self.stats()))
+            else:
+                connection.send((request_id, 'error', f"unknown operation {op!r}"))
+
+    def submit(self, job: _Job) -> bool:
+        """Queue a job; False if the queue is full (a job larger than the queue is taken when it is empty)"""
+        with self._changed:
+            if self._jobs and self._queued_texts + len(job.texts) > self.max_queue:
+                self._stats['rejected'] += 1
+                return False
+            self._jobs.append(job)
+            self._queued_texts += len(job.texts)
+            self._stats['requests'] += 1
+            self._stats['texts'] += len(job.texts)
+            self._changed.notify_all()
+            return True
+
+    def _next_batch(self) -> List[_Job]:
+        """Jobs totalling up to batch_size texts, waiting up to batch_wait for the batch to fill"""
+        with self._changed:
+            while not self._jobs and not self._stop.is_set():
+                self._changed.wait()
+            fill_by = time.monotonic() + self.batch_wait
+            while self._queued_texts < self.batch_size and not self._stop.is_set():
+                remaining = fill_by - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            batch, size = [], 0
+            while self._jobs and (not batch or size + len(self._jobs[0].texts) <= self.batch_size):
+                job = self._jobs.popleft()
+                batch.append(job)
+                size += len(job.texts)
+            self._queued_texts -= size
+            return batch
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            self._count('batches')
+            self._count('batched_texts', sum(len(job.texts) for job in batch))
+            for scorers, jobs in itertools.groupby(sorted(batch, key=lambda job: job.scorers),
+                                                   key=lambda job: job.scorers):
+                self._dispatch(list(jobs), scorers)
+
+    def _dispatch(self, jobs: List[_Job], scorers: tuple):
+        """Score the distinct texts of jobs in up to `workers` chunks; replies go out as chunks finish"""
+        # Every place a text appears: (job, position in that job)
+        places: Dict[str, List[tuple]] = {}
+        for job in jobs:
+            for i, text in enumerate(job.texts):
+                places.setdefault(text, []).append((job, i))
+        unique = list(places)
+        chunk_size = -(-len(unique) // self.workers)
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            self._in_flight.acquire()
+            try:
+                future = self._pool.submit(_score_chunk, chunk, scorers)
+            except RuntimeError:
+                self._in_flight.release()
+                return  # shutting down
+            future.add_done_callback(lambda future, chunk=chunk: self._deliver(future, chunk, places))
+
+    def _deliver(self, future, chunk: List[str], places: Dict[str, List[tuple]]):
+        self._in_flight.release()
+        try:
+            results = future.result()
+        except Exception as e:
+            failed = []
+            with self._changed:
+                self._stats['errors'] += 1
+                for job in {id(job): job for text in chunk for job, _ in places[text]}.values():
+                    if job.results is not None:
+                        job.results = None  # answered now; its other chunks are dropped
+                        failed.append(job)
+            for job in failed:
+                job.connection.send((job.request_id, 'error', f"{type(e).__name__}: {e}"))
+            return
+        finished = []
+        with self._changed:
+            for text, result in zip(chunk, results):
+                for job, i in places[text]:
+                    if job.results is None:
+                        continue
+                    job.results[i] = result
+                    job.pending -= 1
+                    if not job.pending:
+                        finished.append(job)
+        for job in finished:
+            self._latencies.append(time.perf_counter() - job.enqueued)
+            job.connection.send((job.request_id, 'ok', job.results))
+
+    def _count(self, name: str, amount: int = 1):
+        with self._changed:
+            self._stats[name] += amount
+
+    def stats(self) -> Dict:
+        """Queue depth, counters and request latency percentiles (enqueue to reply) in ms"""
+        with self._changed:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._queued_texts
+            stats['queued_requests'] = len(self._jobs)
+        latencies = sorted(self._latencies)
+        stats['workers'] = self.workers
+        stats['mean_batch_size'] = stats['batched_texts'] / stats['batches'] if stats['batches'] else 0.0
+        for pct in (50, 95, 99):
+            stats[f'p{pct}_ms'] = latencies[min(len(latencies) - 1, len(latencies) * pct // 100)] * 1000 \
+                if latencies else 0.0
+        return stats
+
+    def to_prometheus(self) -> str:
+        """stats() in the Prometheus text exposition format"""
+        stats = self.stats()
+        metrics = [
+            ('sentiment_service_queue_depth', 'gauge', 'queue_depth', 'Texts waiting to be batched'),
+            ('sentiment_service_queued_requests', 'gauge', 'queued_requests', 'Requests waiting to be batched'),
+            ('sentiment_service_requests_total', 'counter', 'requests', 'Scoring requests accepted'),
+            ('sentiment_service_texts_total', 'counter', 'texts', 'Review texts accepted'),
+            ('sentiment_service_batches_total', 'counter', 'batches', 'Micro-batches sent to the pool'),
+            ('sentiment_service_rejected_total', 'counter', 'rejected', 'Requests turned away as busy'),
+            ('sentiment_service_errors_total', 'counter', 'errors', 'Chunks that failed to score'),
+            ('sentiment_service_mean_batch_size', 'gauge', 'mean_batch_size', 'Texts per micro-batch'),
+        ]
+        lines = []
+        for metric, kind, key, help_text in metrics:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {stats[key]}"]
+        lines += ["# HELP sentiment_service_latency_ms Request latency over the last 1000 requests",
+                  "# TYPE sentiment_service_latency_ms gauge"]
+        lines += [f'sentiment_service_latency_ms{{quantile="0.{pct}"}} {stats[f"p{pct}_ms"]}' for pct in (50, 95, 99)]
+        return "\n".join(lines) + "\n"
+
+class SentimentServiceClient(ReviewAnalysisAgent):
+    """ReviewAnalysisAgent that scores through the shared SentimentService.
+
+    Cleaning, memoization and the reports are unchanged; only texts the memo
+    does not know are sent to the service. Each thread keeps its own
+    connection. While the service is busy the request is retried with
+    backoff for up to `timeout` seconds; if the service cannot be reached or
+    stays busy, the batch is scored in-process instead.
+    """
+
+    def __init__(self, address: Address = None, timeout: float = None, authkey: bytes = None, **kwargs):
+        super().__init__(**kwargs)
+        self.address = address or parse_address(config.SENTIMENT_SERVICE_ADDRESS or config.SENTIMENT_SERVICE_SOCKET)
+        self.timeout = timeout or config.SENTIMENT_SERVICE_TIMEOUT
+        self.authkey = authkey
+        self._local = threading.local()
+        self._request_ids = itertools.count()
+        self._client_stats = {'remote': 0, 'local': 0, 'busy_retries': 0}
+        self._client_stats_lock = threading.Lock()
+
+    def _connection(self) -> Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # The key is read per connection, so a client started before the service picks it up
+            conn = self._local.conn = Client(self.address, authkey=self.authkey or service_authkey())
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _call(self, op: str, *args, timeout: float = None):
+        timeout = timeout or self.timeout
+        request_id = next(self._request_ids)
+        conn = self._connection()
+        try:
+            conn.send((request_id, op, *args))
+            if not conn.poll(timeout):
+                raise TimeoutError(f"sentiment service did not answer within {timeout:g}s")
+            reply_id, status, payload = conn.recv()
+        except BaseException:
+            # A late or partial reply would be read by the next call; start over on a new connection
+            self._drop_connection()
+            raise
+        if reply_id != request_id:
+            self._drop_connection()
+            raise RuntimeError("sentiment service replied out of order")
+        if status == 'busy':
+            raise ServiceBusy("sentiment service queue is full")
+        if status != 'ok':
+            raise RuntimeError(f"sentiment service error: {payload}")
+        return payload
+
+    def _score_remote(self, cleaned: List[str], scorers: tuple) -> List[Dict]:
+        give_up = time.monotonic() + self.timeout
+        delay = 0.05
+        while True:
+            try:
+                return self._call('score', cleaned, scorers, timeout=max(0.1, give_up - time.monotonic()))
+            except ServiceBusy:
+                if time.monotonic() + delay >= give_up:
+                    raise
+                self._count_client('busy_retries')
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    def _score_cleaned(self, cleaned: List[str], scorers: tuple) -> List[Dict]:
+        if not cleaned:
+            return []
+        try:
+            results = self._score_remote(cleaned, scorers)
+            self._count_client('remote', len(cleaned))
+            return results
+        except (OSError, EOFError, TimeoutError, ServiceBusy, RuntimeError, AuthenticationError) as e:
+            print(f"Sentiment service unavailable ({e}); scoring {len(cleaned)} reviews in-process")
+            self._count_client('local', len(cleaned))
+            return super()._score_cleaned(cleaned, scorers)
+
+    def _count_client(self, name: str, amount: int = 1):
+        with self._client_stats_lock:
+            self._client_stats[name] += amount
+
+    def client_stats(self) -> Dict:
+        """Reviews this process scored through the service and locally, and busy retries"""
+        with self._client_stats_lock:
+            return dict(self._client_stats)
+
+    def service_stats(self) -> Dict:
+        """The service's stats(), or {} if it cannot be reached"""
+        try:
+            return self._call('stats', timeout=2)
+        except (OSError, EOFError, TimeoutError, RuntimeError, AuthenticationError) as e:
+            print(f"Could not read sentiment service stats: {e}")
+            return {}
+
+    def close(self):
+        self._drop_connection()
+        super().close()
+
+def review_agent(**kwargs) -> ReviewAnalysisAgent:
+    """The shared-service client when SENTIMENT_SERVICE_ADDRESS is set, else an in-process agent"""
+    if config.SENTIMENT_SERVICE_ADDRESS:
+        return SentimentServiceClient(**kwargs)
+    return ReviewAnalysisAgent(**kwargs)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=config.SENTIMENT_SERVICE_ADDRESS or config.SENTIMENT_SERVICE_SOCKET,
+                        help="Unix socket path (or host:port) to listen on")
+    parser.add_argument("--workers", type=int, default=config.SENTIMENT_WORKERS)
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port")
+    args = parser.parse_args(argv)
+
+    service = SentimentService(parse_address(args.address), workers=args.workers)
+    if args.metrics_port:
+        from utils.telemetry import serve_metrics
+        serve_metrics(args.metrics_port, render=service.to_prometheus)
+    try:
+        service.start()
+    except OSError as e:
+        print(f"Could not start the sentiment service: {e}")
+        return 2
+    print(f"Sentiment service listening on {args.address} with {args.workers} workers")
+    # A plain kill would skip stop() and leave the socket file behind
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
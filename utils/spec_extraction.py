@@ -0,0 +1,314 @@
+from typing import Dict, Iterable, List, Optional
+from html.parser import HTMLParser
+import json
+import re
+
+SPEC_FIELDS = ('brand', 'model', 'weight', 'dimensions')
+
+# Sources in order of precedence; the regex fallback comes after all of them
+SOURCES = ('json_ld', 'microdata', 'meta', 'table')
+
+# Fallback patterns (the original extractor's, with word boundaries), applied to visible text only
+FALLBACK_PATTERNS = {
+    'brand': re.compile(r'\b(brand|manufacturer|made by|by)\b\s*[:]?\s*([^\n<]+)', re.IGNORECASE),
+    'model': re.compile(r'\b(model|item\s*(number|no))\b\.?\s*[:]?\s*([^\n<]+)', re.IGNORECASE),
+    'weight': re.compile(r'\b(weight)\b\s*[:]?\s*([^\n<]+)', re.IGNORECASE),
+    'dimensions': re.compile(r'\b(dimensions?|size)\b\s*[:]?\s*([^\n<]+)', re.IGNORECASE)
+}
+
+# Spec table / list labels
+LABEL_FIELDS = {
+    'brand': 'brand', 'brand name': 'brand', 'manufacturer': 'brand', 'make': 'brand',
+    'model': 'model', 'model number': 'model', 'model no': 'model', 'model name': 'model',
+    'item model number': 'model', 'mpn': 'model', 'part number': 'model',
+    'weight': 'weight', 'item weight': 'weight', 'product weight': 'weight', 'net weight': 'weight',
+    'dimensions': 'dimensions', 'product dimensions': 'dimensions', 'item dimensions': 'dimensions',
+    'size': 'dimensions'
+}
+
+# schema.org properties, shared by JSON-LD and microdata
+SCHEMA_FIELDS = {'brand': 'brand', 'manufacturer': 'brand', 'model': 'model', 'mpn': 'model', 'weight': 'weight'}
+SCHEMA_DIMENSIONS = ('width', 'height', 'depth')
+UNIT_CODES = {'GRM': 'g', 'KGM': 'kg', 'LBR': 'lb', 'ONZ': 'oz', 'MMT': 'mm', 'CMT': 'cm', 'MTR': 'm', 'INH': 'in'}
+
+META_FIELDS = {'product:brand': 'brand', 'og:brand': 'brand', 'brand': 'brand',
+               'product:weight:value': 'weight'}
+
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'}
+# Start tags that implicitly close an open element, and end tags that close unclosed children
+IMPLICIT_CLOSE = {'li': ('li',), 'td': ('td', 'th'), 'th': ('td', 'th'), 'tr': ('td', 'th'),
+                  'dt': ('dt', 'dd'), 'dd': ('dt', 'dd')}
+CLOSED_BY_END = {'tr': ('td', 'th'), 'table': ('td', 'th'), 'ul': ('li',), 'ol': ('li',), 'dl': ('dt', 'dd')}
+
+# Characters fed per step; parsing stops at the first step where every field is found
+CHUNK_CHARS = 64 * 1024
+
+def clean_value(value) -> str:
+    return " ".join(str(value).split()).strip(" :;|-")[:200]
+
+def label_field(label: str) -> Optional[str]:
+    return LABEL_FIELDS.get(" ".join(label.lower().replace(':', ' ').split()).strip(" .#"))
+
+def schema_value(value) -> str:
+    """Flatten a schema.org value: Brand/Thing names, QuantitativeValues, lists"""
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, dict):
+        if 'value' in value:
+            unit = value.get('unitText') or UNIT_CODES.get(value.get('unitCode'), value.get('unitCode', ''))
+            return f"{value['value']} {unit}".strip()
+        return str(value.get('name', ''))
+    return str(value)
+
+def find_products(data) -> Iterable[Dict]:
+    """Product objects anywhere in a JSON-LD document, including @graph"""
+    if isinstance(data, list):
+        for item in data:
+            yield from find_products(item)
+    elif isinstance(data, dict):
+        types = data.get('@type', [])
+        types = types if isinstance(types, list) else [types]
+        if any(str(t).endswith('Product') or t == 'ProductModel' for t in types):
+            yield data
+        for key in ('@graph', 'mainEntity', 'itemListElement', 'item'):
+            if key in data:
+                yield from find_products(data[key])
+
+class _OpenElement:
+    """An element whose text is being collected until it closes"""
+    __slots__ = ('tag', 'depth', 'parts', 'on_close', 'field')
+
+    def __init__(self, tag: str, on_close=None, field: str = None):
+        self.tag = tag
+        self.depth = 1
+        self.parts: List[str] = []
+        self.on_close = on_close
+        self.field = field
+
+class SpecParser(HTMLParser):
+    """Incremental spec extractor; feed() it HTML in pieces and stop when complete.
+
+    Collects candidate values from JSON-LD Product blocks, schema.org
+    microdata, OpenGraph/product meta tags and spec tables or lists, plus
+    the page's visible text for the regex fallback.
+    """
+
+    def __init__(self, fields: Iterable[str] = SPEC_FIELDS, want_description: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.fields = tuple(fields)
+        self.want_description = want_description
+        self.found: Dict[str, Dict[str, str]] = {source: {} for source in SOURCES}
+        self.description: Optional[str] = None
+        self.visible: List[str] = []
+        self._skip = 0
+        self._json_ld: Optional[List[str]] = None
+        self._open: List[_OpenElement] = []
+        self._scopes: List[_OpenElement] = []
+        self._row: Optional[List[str]] = None
+        self._term: Optional[str] = None
+        self._meta_weight_unit = ""
+
+    @property
+    def complete(self) -> bool:
+        """True once every requested field (and the description, if wanted) has a structured value"""
+        if self.want_description and self.description is None:
+            return False
+        return all(any(field in self.found[source] for source in SOURCES) for field in self.fields)
+
+    def offer(self, source: str, field: str, value):
+        """Record a candidate; the first value per source and field wins"""
+        if field in self.fields and field not in self.found[source]:
+            value = clean_value(value)
+            if value:
+                self.found[source][field] = value
+
+    def specs(self) -> Dict[str, str]:
+        """Best value per field by source precedence, falling back to regexes over visible text"""
+        specs = {}
+        text = None
+        for field in self.fields:
+            for source in SOURCES:
+                if field in self.found[source]:
+                    specs[field] = self.found[source][field]
+                    break
+            else:
+                if field not in FALLBACK_PATTERNS:
+                    continue
+                text = "".join(self.visible) if text is None else text
+                match = FALLBACK_PATTERNS[field].search(text)
+                if match and clean_value(match.groups()[-1]):
+                    specs[field] = clean_value(match.groups()[-1])
+        return specs
+
+    # Element bookkeeping
+
+    def _close(self, element: _OpenElement):
+        self._open.remove(element)
+        if element.on_close:
+            element.on_close("".join(element.parts))
+
+    def _break_text(self):
+        """Tags end a run of visible text, like '<' ends a match in raw HTML"""
+        if self.visible and self.visible[-1] != "\n":
+            self.visible.append("\n")
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self._break_text()
+        for element in list(self._open):
+            if element.depth == 1 and element.tag in IMPLICIT_CLOSE.get(tag, ()):
+                self._close(element)
+        for element in self._open + self._scopes:
+            if element.tag == tag:
+                element.depth += 1
+
+        if tag in SKIPPED_TAGS:
+            self._skip += 1
+            if tag == 'script' and 'ld+json' in (attrs.get('type') or ''):
+                self._json_ld = []
+        elif tag == 'meta':
+            self._meta(attrs)
+        elif tag == 'body' and self.description is None:
+            self.description = ""  # the head is over; there is no meta description
+        elif tag == 'tr':
+            self._finish_row()
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._open.append(_OpenElement(tag, self._row.append))
+        elif tag == 'dt':
+            self._open.append(_OpenElement(tag, self._set_term))
+        elif tag == 'dd':
+            self._open.append(_OpenElement(tag, self._definition))
+        elif tag == 'li':
+            self._open.append(_OpenElement(tag, self._list_item))
+
+        if 'itemprop' in attrs:
+            self._microdata(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._break_text()
+        if tag in SKIPPED_TAGS:
+            self._skip = max(0, self._skip - 1)
+            if tag == 'script' and self._json_ld is not None:
+                self._parse_json_ld("".join(self._json_ld))
+                self._json_ld = None
+        for element in list(self._open):
+            if element.tag in CLOSED_BY_END.get(tag, ()):
+                self._close(element)
+            elif element.tag == tag:
+                element.depth -= 1
+                if element.depth == 0:
+                    self._close(element)
+        for scope in list(self._scopes):
+            if scope.tag == tag:
+                scope.depth -= 1
+                if scope.depth == 0:
+                    self._scopes.remove(scope)
+        if tag in ('tr', 'table'):
+            self._finish_row()
+
+    def handle_data(self, data):
+        if self._json_ld is not None:
+            self._json_ld.append(data)
+        if self._skip:
+            return
+        self.visible.append(data)
+        for element in self._open:
+            element.parts.append(data)
+
+    # Sources
+
+    def _parse_json_ld(self, text: str):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+        for product in find_products(data):
+            for key, field in SCHEMA_FIELDS.items():
+                if key in product:
+                    self.offer('json_ld', field, schema_value(product[key]))
+            dimensions = [schema_value(product[key]) for key in SCHEMA_DIMENSIONS if key in product]
+            if dimensions:
+                self.offer('json_ld', 'dimensions', " x ".join(dimensions))
+
+    def _microdata(self, tag: str, attrs: Dict):
+        for prop in attrs['itemprop'].split():
+            # A nested name/value inside e.g. itemprop="brand" itemscope is the brand's value
+            if prop in ('name', 'value') and self._scopes:
+                field = self._scopes[-1].field
+            elif prop in ('unitCode', 'unitText') and self._scopes:
+                self._unit(self._scopes[-1].field, attrs.get('content') or '')
+                continue
+            else:
+                field = SCHEMA_FIELDS.get(prop)
+            if field is None:
+                continue
+            if 'itemscope' in attrs:
+                self._scopes.append(_OpenElement(tag, field=field))
+                continue
+            value = attrs.get('content') or (attrs.get('href') if tag == 'link' else None)
+            if value:
+                self.offer('microdata', field, value)
+            elif tag not in VOID_TAGS:
+                self._open.append(_OpenElement(tag, lambda text, field=field: self.offer('microdata', field, text)))
+
+    def _unit(self, field: str, unit: str):
+        """Append a QuantitativeValue unit to a bare microdata number"""
+        value = self.found['microdata'].get(field)
+        if value and unit and not re.search(r'[a-z]', value, re.I):
+            self.found['microdata'][field] = clean_value(f"{value} {UNIT_CODES.get(unit, unit)}")
+
+    def _meta(self, attrs: Dict):
+        key = (attrs.get('property') or attrs.get('name') or '').lower()
+        content = attrs.get('content') or ''
+        if key == 'description' and self.description is None:
+            self.description = content
+        elif key == 'product:weight:units':
+            self._meta_weight_unit = content
+            if 'weight' in self.found['meta'] and not re.search(r'[a-z]', self.found['meta']['weight'], re.I):
+                self.found['meta']['weight'] = clean_value(f"{self.found['meta']['weight']} {content}")
+        elif key in META_FIELDS:
+            value = f"{content} {self._meta_weight_unit}" if key == 'product:weight:value' else content
+            self.offer('meta', META_FIELDS[key], value)
+
+    def _finish_row(self):
+        if self._row and len(self._row) >= 2:
+            self._labelled(self._row[0], self._row[1])
+        self._row = None
+
+    def _labelled(self, label: str, value: str):
+        field = label_field(label)
+        if field:
+            self.offer('table', field, value)
+
+    def _set_term(self, text: str):
+        self._term = text
+
+    def _definition(self, text: str):
+        if self._term:
+            self._labelled(self._term, text)
+            self._term = None
+
+    def _list_item(self, text: str):
+        label, sep, value = text.partition(':')
+        if sep and len(label) <= 40:
+            self._labelled(label, value)
+
+def feed_until_complete(parser: SpecParser, html: str, chunk_chars: int = CHUNK_CHARS) -> SpecParser:
+    """Feed a whole page in chunks, stopping as soon as the parser is complete"""
+    for start in range(0, len(html), chunk_chars):
+        parser.feed(html[start:start + chunk_chars])
+        if parser.complete:
+            return parser
+    parser.close()
+    return parser
+
+def extract_specs(html: str, fields: Iterable[str] = SPEC_FIELDS, chunk_chars: int = CHUNK_CHARS) -> Dict[str, str]:
+    """Extract specs from a page, stopping as soon as every field is found"""
+    return feed_until_complete(SpecParser(fields), html, chunk_chars).specs()
@@ -0,0 +1,51 @@
+from typing import Dict
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+# Taken when this module is first imported, i.e. at the top of the first script run
+PROCESS_START = time.perf_counter()
+
+class StartupReport:
+    """Time to first render, one-off initialization stages and per-rerun overhead"""
+
+    def __init__(self, max_reruns: int = 100):
+        self.first_render = None
+        self.stages: Dict[str, float] = {}
+        self.reruns = deque(maxlen=max_reruns)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a lazy initialization step such as loading an agent"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def mark_first_render(self):
+        """Record when the first page content went out; later calls are ignored"""
+        with self._lock:
+            if self.first_render is None:
+                self.first_render = time.perf_counter() - PROCESS_START
+
+    def record_rerun(self, seconds: float):
+        with self._lock:
+            self.reruns.append(seconds)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            reruns = list(self.reruns)
+            stages = dict(self.stages)
+        return {
+            'time_to_first_render': self.first_render,
+            'stages': stages,
+            'reruns': len(reruns),
+            'last_rerun': reruns[-1] if reruns else None,
+            'average_rerun': sum(reruns) / len(reruns) if reruns else None
+        }
+
+startup_report = StartupReport()
@@ -0,0 +1,397 @@
+from typing import Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import config
+from utils.nlp_utils import GENERIC_REVIEW_TERMS, index_terms, normalize_term
+from utils.search_cache import normalize_query
+
+# query_log scores are stored as sum(2 ** ((searched_at - QUERY_LOG_EPOCH) / half_life)), so a
+# search adds one term and rows rank by the raw column. Dividing by 2 ** ((now - QUERY_LOG_EPOCH) /
+# half_life) gives the decayed count. Floats hold about 1000 half-lives past the epoch.
+QUERY_LOG_EPOCH = 1704067200.0  # 2024-01-01 UTC
+# Queries whose decayed count falls below this are dropped from the log
+QUERY_LOG_MIN_SCORE = 0.01
+
+# Review sentiment labels, on the same thresholds ReviewAnalysisAgent classifies with
+SENTIMENT_LABELS = {'positive': 1, 'neutral': 0, 'negative': -1}
+
+def review_score(analysis: Dict) -> Optional[float]:
+    """Classification score of one analyzed review: VADER compound, else TextBlob polarity"""
+    if 'vader' in analysis:
+        return analysis['vader']['compound']
+    if 'textblob' in analysis:
+        return analysis['textblob']['polarity']
+    return None
+
+def sentiment_label(score: Optional[float]) -> Optional[int]:
+    if score is None:
+        return None
+    return 1 if score >= 0.05 else -1 if score <= -0.05 else 0
+
+def query_terms(text: str) -> List[str]:
+    """Normalized terms of a search phrase; every one of them must appear in a match"""
+    return index_terms(text)
+
+class ResearchStore:
+    """Indexed SQLite store for research results.
+
+    Products, their reviews and review analyses are keyed by normalized
+    query and product URL, written with incremental upserts and read a page
+    at a time. WAL mode lets many sessions read while one writes.
+
+    Reviews are also indexed as they are written: review_terms holds one
+    posting per (term, review) with the review's sentiment label, so
+    "negative reviews mentioning battery" is an index range scan.
+
+    query_log keeps a time-decayed count of submitted searches, which the
+    background prefetcher uses to pick the queries worth keeping warm.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.STORE_PATH
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    query TEXT PRIMARY KEY,
+                    display_query TEXT,
+                    updated_at REAL,
+                    source TEXT
+                );
+                CREATE TABLE IF NOT EXISTS products (
+                    query TEXT,
+                    url TEXT,
+                    position INTEGER,
+                    data TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (query, url)
+                );
+                CREATE INDEX IF NOT EXISTS idx_products_position ON products (query, position);
+                CREATE TABLE IF NOT EXISTS reviews (
+                    query TEXT,
+                    url TEXT,
+                    position INTEGER,
+                    text TEXT,
+                    sentiment REAL,
+                    PRIMARY KEY (query, url, position)
+                );
+                CREATE TABLE IF NOT EXISTS review_terms (
+                    term TEXT,
+                    query TEXT,
+                    url TEXT,
+                    position INTEGER,
+                    label INTEGER,
+                    PRIMARY KEY (term, query, url, position)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_review_terms_product ON review_terms (query, url);
+                CREATE TABLE IF NOT EXISTS analyses (
+                    query TEXT,
+                    url TEXT,
+                    summary TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (query, url)
+                );
+                CREATE TABLE IF NOT EXISTS query_log (
+                    query TEXT PRIMARY KEY,
+                    display_query TEXT,
+                    score REAL,
+                    searches INTEGER,
+                    last_seen REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_query_log_score ON query_log (score);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections must not be shared across writers"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _product_url(product: Dict) -> str:
+        return product.get('url') or product.get('title') or ''
+
+    def upsert_products(self, query: str, products: List[Dict], replace: bool = False,
+                        source: str = "interactive"):
+        """Insert or update the products, reviews and analyses for one query.
+
+        With replace=True, products of this query missing from the new list
+        are removed, so a fresh search supersedes the previous one. source
+        records what produced the results ("interactive", "batch", "prefetch").
+        """
+        key = normalize_query(query)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO searches (query, display_query, updated_at, source) "
+                         "VALUES (?, ?, ?, ?)", (key, query, now, source))
+            if replace:
+                keep = [self._product_url(product) for product in products]
+                placeholders = ','.join('?' * len(keep))
+                for table in ('products', 'reviews', 'analyses', 'review_terms'):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE query = ? AND url NOT IN ({placeholders})",
+                        [key] + keep
+                    )
+            for position, product in enumerate(products):
+                url = self._product_url(product)
+                data = {k: v for k, v in product.items() if k not in ('reviews', 'review_summary')}
+                conn.execute(
+                    "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?)",
+                    (key, url, position, json.dumps(data), now)
+                )
+                reviews = [review if isinstance(review, str) else json.dumps(review)
+                           for review in product.get('reviews', [])]
+                # analyze_reviews returns per-review scores in review order
+                analyzed = (product.get('review_summary') or {}).get('reviews') or []
+                scores = [review_score(analysis) for analysis in analyzed[:len(reviews)]]
+                scores += [None] * (len(reviews) - len(scores))
+                conn.execute("DELETE FROM reviews WHERE query = ? AND url = ? AND position >= ?",
+                             (key, url, len(reviews)))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?)",
+                    [(key, url, i, review, score) for i, (review, score) in enumerate(zip(reviews, scores))]
+                )
+                conn.execute("DELETE FROM review_terms WHERE query = ? AND url = ?", (key, url))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO review_terms VALUES (?, ?, ?, ?, ?)",
+                    [(term, key, url, i, sentiment_label(score))
+                     for i, (review, score) in enumerate(zip(reviews, scores))
+                     for term in index_terms(review)]
+                )
+                if product.get('review_summary') is not None:
+                    # Per-review scores are already stored with the reviews
+                    summary = {k: v for k, v in product['review_summary'].items() if k != 'reviews'}
+                    conn.execute(
+                        "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)",
+                        (key, url, json.dumps(summary), now)
+                    )
+
+    def latest_query(self) -> Optional[str]:
+        """The most recently researched query, as the user typed it"""
+        row = self._connect().execute(
+            "SELECT display_query FROM searches ORDER BY updated_at DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def version(self) -> Optional[float]:
+        """When any query's stored results last changed; reads cached under an older value are stale"""
+        return self._connect().execute("SELECT MAX(updated_at) FROM searches").fetchone()[0]
+
+    def search_info(self, query: str) -> Optional[Dict]:
+        """When a query's stored results were last refreshed, and by what"""
+        row = self._connect().execute(
+            "SELECT display_query, updated_at, source FROM searches WHERE query = ?", (normalize_query(query),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'query': row[0], 'updated_at': row[1], 'age': time.time() - row[1], 'source': row[2] or "interactive"}
+
+    @staticmethod
+    def _query_weight(at: float) -> float:
+        """What one search at time `at` adds to a query_log score"""
+        return 2 ** ((at - QUERY_LOG_EPOCH) / config.QUERY_LOG_HALF_LIFE)
+
+    def record_query(self, query: str):
+        """Count a submitted search into the decayed query frequency log.
+
+        One upsert, plus an indexed delete of queries that have decayed
+        away; a locked database only costs this search its count.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO query_log VALUES (?, ?, ?, 1, ?) ON CONFLICT (query) DO UPDATE SET "
+                    "display_query = excluded.display_query, score = score + excluded.score, "
+                    "searches = searches + 1, last_seen = excluded.last_seen",
+                    (normalize_query(query), query, self._query_weight(now), now)
+                )
+                conn.execute("DELETE FROM query_log WHERE score < ?", (QUERY_LOG_MIN_SCORE * self._query_weight(now),))
+        except sqlite3.OperationalError as e:
+            print(f"Could not record query '{query}': {e}")
+
+    def popular_queries(self, top_k: int = 10) -> List[Dict]:
+        """The top_k most searched queries, with older searches counting for less"""
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT l.display_query, l.score, l.searches, l.last_seen, s.updated_at, s.source "
+            "FROM query_log l LEFT JOIN searches s ON s.query = l.query ORDER BY l.score DESC LIMIT ?",
+            (top_k,)
+        ).fetchall()
+        decay = self._query_weight(now)
+        return [
+            {'query': display_query, 'score': score / decay,
+             'searches': searches, 'last_seen': last_seen, 'updated_at': updated_at, 'source': source,
+             'age': now - updated_at if updated_at else None}
+            for display_query, score, searches, last_seen, updated_at, source in rows
+        ]
+
+    def count_products(self, query: str) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM products WHERE query = ?", (normalize_query(query),)
+        ).fetchone()[0]
+
+    def load_products(self, query: str, limit: int = None, offset: int = 0,
+                      include_reviews: bool = False) -> List[Dict]:
+        """One page of a query's products with their review analyses attached"""
+        key = normalize_query(query)
+        limit = limit or config.PRODUCTS_PAGE_SIZE
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT p.url, p.data, a.summary FROM products p "
+            "LEFT JOIN analyses a ON a.query = p.query AND a.url = p.url "
+            "WHERE p.query = ? ORDER BY p.position LIMIT ? OFFSET ?",
+            (key, limit, offset)
+        ).fetchall()
+
+        products = []
+        for url, data, summary in rows:
+            product = json.loads(data)
+            if summary is not None:
+                product['review_summary'] = json.loads(summary)
+            if include_reviews:
+                product['reviews'] = self.load_reviews(query, url)
+            products.append(product)
+        return products
+
+    def load_reviews(self, query: str, url: str, limit: int = -1, offset: int = 0) -> List[str]:
+        """Reviews stored for one product, in their original order"""
+        rows = self._connect().execute(
+            "SELECT text FROM reviews WHERE query = ? AND url = ? ORDER BY position LIMIT ? OFFSET ?",
+            (normalize_query(query), url, limit, offset)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _postings_filter(self, terms: List[str], sentiment: str = None, query: str = None):
+        """SQL selecting (query, url, position, label) of reviews containing every term"""
+        sql = ("SELECT query, url, position, MIN(label) AS label FROM review_terms "
+               f"WHERE term IN ({','.join('?' * len(terms))})")
+        params: List = list(terms)
+        if query is not None:
+            sql += " AND query = ?"
+            params.append(normalize_query(query))
+        if sentiment is not None:
+            sql += " AND label = ?"
+            params.append(SENTIMENT_LABELS[sentiment])
+        sql += " GROUP BY query, url, position HAVING COUNT(*) = ?"
+        params.append(len(terms))
+        return sql, params
+
+    def search_reviews(self, text: str, sentiment: str = None, query: str = None,
+                       limit: int = 20) -> List[Dict]:
+        """Products whose reviews mention every term of text, most mentions first.
+
+        sentiment ('positive', 'neutral' or 'negative') keeps only reviews
+        with that label; query limits the search to one research query.
+        """
+        terms = query_terms(text)
+        if not terms:
+            return []
+        matches, params = self._postings_filter(terms, sentiment, query)
+        rows = self._connect().execute(
+            f"SELECT m.query, m.url, json_extract(p.data, '$.title'), COUNT(*), "
+            f"SUM(m.label = 1), SUM(m.label = 0), SUM(m.label = -1) "
+            f"FROM ({matches}) m LEFT JOIN products p ON p.query = m.query AND p.url = m.url "
+            f"GROUP BY m.query, m.url ORDER BY COUNT(*) DESC, m.query, m.url LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [
+            {'query': q, 'url': url, 'title': title or url, 'mentions': mentions,
+             'positive': positive or 0, 'neutral': neutral or 0, 'negative': negative or 0}
+            for q, url, title, mentions, positive, neutral, negative in rows
+        ]
+
+    def review_mentions(self, text: str, url: str, query: str, sentiment: str = None,
+                        limit: int = 3) -> List[str]:
+        """Texts of one product's reviews that mention every term of text"""
+        terms = query_terms(text)
+        if not terms:
+            return []
+        matches, params = self._postings_filter(terms, sentiment, query)
+        rows = self._connect().execute(
+            f"SELECT r.text FROM ({matches}) m JOIN reviews r "
+            f"ON r.query = m.query AND r.url = m.url AND r.position = m.position "
+            f"WHERE m.url = ? ORDER BY m.position LIMIT ?",
+            params + [url, limit]
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def aspect_sentiment(self, aspects: List[str] = None, query: str = None,
+                         top_n: int = 8) -> Dict[str, Dict[str, int]]:
+        """Positive/neutral/negative review counts per aspect term.
+
+        Without aspects, the top_n most mentioned terms among labelled
+        reviews are used, leaving out generic review words.
+        """
+        conn = self._connect()
+        scope, params = ("AND query = ?", [normalize_query(query)]) if query is not None else ("", [])
+        if aspects:
+            terms = list(dict.fromkeys(normalize_term(aspect.lower()) for aspect in aspects))
+        else:
+            generic = sorted(GENERIC_REVIEW_TERMS)
+            terms = [row[0] for row in conn.execute(
+                f"SELECT term FROM review_terms WHERE label IS NOT NULL {scope} "
+                f"AND term NOT IN ({','.join('?' * len(generic))}) "
+                f"GROUP BY term ORDER BY COUNT(*) DESC, term LIMIT ?", params + generic + [top_n]
+            )]
+        if not terms:
+            return {}
+        counts = {term: {'positive': 0, 'neutral': 0, 'negative': 0} for term in terms}
+        names = {value: name for name, value in SENTIMENT_LABELS.items()}
+        for term, label, count in conn.execute(
+            f"SELECT term, label, COUNT(*) FROM review_terms "
+            f"WHERE term IN ({','.join('?' * len(terms))}) AND label IS NOT NULL {scope} GROUP BY term, label",
+            terms + params
+        ):
+            counts[term][names[label]] = count
+        return counts
+
+    def import_json(self, products_file: str, reviews_file: str = None,
+                    query: str = "imported") -> int:
+        """One-time import of the legacy products.json / reviews.json files"""
+        conn = self._connect()
+        if conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone():
+            return 0
+
+        products, reviews = [], []
+        try:
+            if products_file and os.path.exists(products_file):
+                with open(products_file, "r") as f:
+                    products = json.load(f)
+            if reviews_file and os.path.exists(reviews_file):
+                with open(reviews_file, "r") as f:
+                    reviews = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Error reading legacy data files: {e}")
+
+        # The legacy reviews file is a flat list not linked to products
+        if reviews:
+            products = products + [{'url': '', 'title': 'Imported reviews', 'reviews': reviews}]
+        if products:
+            self.upsert_products(query, products)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('json_imported', ?)", (str(time.time()),))
+        return len(products)
+
+_shared_store: Optional[ResearchStore] = None
+_shared_lock = threading.Lock()
+
+def get_research_store() -> ResearchStore:
+    """Return the process-wide store, creating it on first use"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = ResearchStore()
+        return _shared_store
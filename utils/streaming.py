@@ -0,0 +1,65 @@
+from typing import Dict, Hashable, Iterator, List, Tuple
+import heapq
+import json
+import math
+
+class RunningStats:
+    """Count, mean and variance maintained in O(1) memory (Welford's method)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values seen so far"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+class HeavyHitters:
+    """Bounded frequent-items sketch (mergeable Misra-Gries summary).
+
+    Keeps at most `capacity` counters. Counts are merged a chunk at a time,
+    and whenever the summary overflows every counter is reduced by the
+    (capacity + 1)-th largest count. Any item occurring more than
+    total / (capacity + 1) times survives, and each estimate undercounts by
+    at most that amount.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+
+    def update(self, counts: Dict[Hashable, int]):
+        """Merge a chunk's item counts into the summary"""
+        for item, count in counts.items():
+            self.counts[item] = self.counts.get(item, 0) + count
+        if len(self.counts) > self.capacity:
+            cut = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+            self.counts = {item: count - cut for item, count in self.counts.items() if count > cut}
+
+    def top(self, k: int) -> List[Tuple[Hashable, int]]:
+        """The k items with the highest estimated counts, ties in first-seen order"""
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:k]
+
+def iter_jsonl_reviews(path: str, field: str = 'text') -> Iterator[str]:
+    """Lazily yield review text from a JSONL dump, one line at a time"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = record.get(field) if isinstance(record, dict) else record
+            if text:
+                yield text
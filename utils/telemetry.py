@@ -0,0 +1,195 @@
+from typing import Callable, Dict, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("research.trace")
+
+# Attributes summed into the per-stage counters
+COUNTED_ATTRIBUTES = ('items', 'bytes', 'bytes_saved', 'cache_hits')
+
+@dataclass
+class Span:
+    name: str
+    run_id: Optional[str]
+    start: float
+    duration: float = 0.0
+    parent: Optional[str] = None
+    attributes: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+def add_span(totals: Dict[str, Dict[str, float]], span: Span):
+    """Fold one span into per-stage totals keyed by span name"""
+    stage = totals.setdefault(span.name, {'count': 0, 'seconds': 0.0, 'errors': 0})
+    stage['count'] += 1
+    stage['seconds'] += span.duration
+    stage['errors'] += int(span.error is not None)
+    for key in COUNTED_ATTRIBUTES:
+        if isinstance(span.attributes.get(key), (int, float)):
+            stage[key] = stage.get(key, 0) + span.attributes[key]
+
+def merge_totals(totals: Dict[str, Dict[str, float]], other: Dict[str, Dict[str, float]]):
+    """Add per-stage totals from another tracer or process into totals"""
+    for name, values in other.items():
+        stage = totals.setdefault(name, {})
+        for key, value in values.items():
+            stage[key] = stage.get(key, 0) + value
+
+@dataclass
+class Run:
+    run_id: str
+    label: str
+    start: float
+    spans: List[Span] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        totals = {}
+        for span in self.spans:
+            add_span(totals, span)
+        return totals
+
+_current_run: ContextVar[Optional[Run]] = ContextVar("current_run", default=None)
+_open_spans: ContextVar[tuple] = ContextVar("open_spans", default=())
+
+class Tracer:
+    """Records timed spans for each pipeline stage.
+
+    Spans belong to the run active in the current context (threads started
+    with contextvars.copy_context inherit it) and are also folded into
+    per-stage totals that can be exported in Prometheus text format.
+    """
+
+    def __init__(self, max_runs: int = 20):
+        self.runs = deque(maxlen=max_runs)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, label: str):
+        """Group every span recorded inside this block into one run"""
+        run = Run(run_id=uuid.uuid4().hex[:12], label=label, start=time.time())
+        token = _current_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+            with self._lock:
+                self.runs.append(run)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a block; attributes can be added through the yielded span"""
+        run = _current_run.get()
+        open_spans = _open_spans.get()
+        span = Span(name=name, run_id=run.run_id if run else None, start=time.time(),
+                    parent=open_spans[-1].name if open_spans else None, attributes=dict(attributes))
+        token = _open_spans.set(open_spans + (span,))
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _open_spans.reset(token)
+            self._finish(span, run)
+
+    def _finish(self, span: Span, run: Optional[Run]):
+        with self._lock:
+            if run is not None:
+                run.spans.append(span)
+            add_span(self._totals, span)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(asdict(span)))
+
+    def last_run(self) -> Optional[Run]:
+        with self._lock:
+            return self.runs[-1] if self.runs else None
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(values) for name, values in self._totals.items()}
+
+    def to_json_lines(self, run: Run = None) -> str:
+        """Spans of a run (the last one by default) as structured log lines"""
+        run = run or self.last_run()
+        if run is None:
+            return ""
+        return "\n".join(json.dumps({'run': run.label, **asdict(span)}) for span in run.spans)
+
+    def to_prometheus(self) -> str:
+        """Per-stage totals in the Prometheus text exposition format"""
+        lines = []
+        totals = self.totals()
+        metrics = [
+            ('research_stage_calls_total', 'count', 'Stage invocations'),
+            ('research_stage_seconds_total', 'seconds', 'Time spent in each stage'),
+            ('research_stage_errors_total', 'errors', 'Stage invocations that raised'),
+            ('research_stage_items_total', 'items', 'Items processed by each stage'),
+            ('research_stage_bytes_total', 'bytes', 'Bytes fetched by each stage'),
+            ('research_stage_bytes_saved_total', 'bytes_saved', 'Bytes left unread by early-terminated fetches'),
+            ('research_stage_cache_hits_total', 'cache_hits', 'Cache hits within each stage'),
+        ]
+        for metric, key, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage, values in sorted(totals.items()):
+                if key in values:
+                    lines.append(f'{metric}{{stage="{stage}"}} {values[key]}')
+        return "\n".join(lines) + "\n"
+
+tracer = Tracer()
+
+def annotate(**counts):
+    """Add counts (bytes, cache_hits, ...) to every open span, innermost to outermost"""
+    for span in _open_spans.get():
+        for key, value in counts.items():
+            span.attributes[key] = span.attributes.get(key, 0) + value
+
+def traced(name: str, items: Callable = None):
+    """Decorator recording a span per call; items(result) sets the item count"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name) as span:
+                result = fn(*args, **kwargs)
+                if items is not None:
+                    try:
+                        span.attributes['items'] = items(result)
+                    except Exception:
+                        pass
+                return result
+        return wrapper
+    return decorator
+
+def serve_metrics(port: int, host: str = "127.0.0.1", render: Callable[[], str] = None) -> ThreadingHTTPServer:
+    """Expose render() (tracer.to_prometheus() by default) at /metrics from a background thread"""
+    render = render or tracer.to_prometheus
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server